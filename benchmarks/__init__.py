@@ -0,0 +1,6 @@
+"""Benchmarks of the repository analyzer on generated git repositories
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks
+"""
@@ -0,0 +1,277 @@
+"""Times the analyzer stages on synthetic repositories of several sizes
+
+Results are written as JSON, a previous results file can be given to compare
+against and report the stages that got slower. Every scale also checks that
+the filters pushed down into git give the same rows as the whole history, and
+that the pathspecs of wildcard path filters select every file they should.
+
+    python -m benchmarks.run_benchmarks --scales small medium --compare benchmarks/results/old.json
+"""
+import os
+import sys
+import time
+import json
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from os import path
+from datetime import datetime, timezone
+from contextlib import redirect_stdout
+from dataclasses import asdict
+from importlib.metadata import version
+
+import repositoryAnalyzer as analyzer
+from benchmarks.synthetic_repo import SyntheticRepoConfig, generate_repository
+
+
+# Repository shapes by scale name
+SCALES: dict[str, SyntheticRepoConfig] = {
+    "small": SyntheticRepoConfig(commits=200, files=20, branches=2, authors=4),
+    "medium": SyntheticRepoConfig(commits=2_000, files=100, branches=4, authors=10),
+    "large": SyntheticRepoConfig(commits=10_000, files=300, branches=8, authors=30),
+    "huge": SyntheticRepoConfig(commits=100_000, files=1_000, branches=16, authors=100),
+}
+DEFAULT_SCALES: list[str] = ["small", "medium", "large"]
+
+# Generated repositories are kept here and reused by later runs
+REPOS_DIR: str = path.join(path.dirname(__file__), "repos")
+RESULTS_DIR: str = path.join(path.dirname(__file__), "results")
+
+# Path filters with wildcards whose pathspecs are checked against the analyzer's own filtering
+WILDCARD_SCOPES: list[str] = ["src/*", "src/module[01]", "src/module?/file1*", "[rs]*/*/file?.c"]
+
+# Runs of parse_commits, and of the faster stages working on its output
+PARSE_REPEAT: int = 1
+STAGE_REPEAT: int = 5
+
+# A stage is reported as a regression when it's slower than this ratio,
+# and by more than the minimum difference which hides timer noise
+REGRESSION_RATIO: float = 1.10
+REGRESSION_MIN_SECONDS: float = 0.005
+
+
+def get_repository(scale: str, config: SyntheticRepoConfig) -> str:
+    """Gets the repository of a scale, generating it on the first use
+
+    Args:
+        scale (str): Scale name
+        config (SyntheticRepoConfig): Shape of the repository
+
+    Returns:
+        str: Repository path
+    """
+    repo_path = path.join(REPOS_DIR, f"{scale}-{config.commits}-{config.files}-{config.seed}")
+    if not path.isdir(repo_path):
+        print(f" * Generating {scale} repository ({config.commits} commits, {config.files} files)")
+        os.makedirs(REPOS_DIR, exist_ok=True)
+        start = time.perf_counter()
+        generate_repository(repo_path, config)
+        print(f"   done in {time.perf_counter() - start:.1f} s")
+    return repo_path
+
+
+def time_stage(function, repeat: int) -> tuple[dict, object]:
+    """Runs a stage several times
+
+    Args:
+        function: Stage to run, without arguments
+        repeat (int): Number of runs
+
+    Returns:
+        tuple[dict, object]: Timings in seconds and the result of the last run
+    """
+    times: list[float] = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return dict(min=min(times), median=statistics.median(times), runs=repeat), result
+
+
+def check_pushdown(repo_path: str, data: list) -> bool:
+    """Checks that filtering in git gives the same rows as traversing the whole history
+
+    The synthetic repositories only have C and C++ files, so the extension
+    filter pushed down into git must not change the result.
+
+    Args:
+        repo_path (str): Repository path
+        data (list): Rows of the filtered run
+
+    Returns:
+        bool: True if both runs give the same rows, branches included
+    """
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+        unfiltered = analyzer.parse_commits(repo_path, [], [], [])
+    rows = [(repr(item), item.branches) for item in data]
+    unfiltered_rows = [(repr(item), item.branches) for item in unfiltered]
+    if rows != unfiltered_rows:
+        print(f"   filtered run gives {len(rows)} rows, the whole history {len(unfiltered_rows)}")
+        return False
+    return True
+
+
+def list_files(repo_path: str, pathspecs: list[str]) -> list[str]:
+    """Lists the files of the checked out revision that git selects for pathspecs
+
+    Args:
+        repo_path (str): Repository path
+        pathspecs (list[str]): Pathspecs, empty lists every file
+
+    Returns:
+        list[str]: File paths relative to the repository root
+    """
+    output = subprocess.run(["git", "-C", repo_path, "ls-files", "-z", "--", *pathspecs],
+                            check=True, capture_output=True).stdout
+    return [file_path.decode("utf-8", "surrogateescape") for file_path in output.split(b"\0") if file_path]
+
+
+def check_pathspecs(repo_path: str, filter_by_extension: list[str]) -> bool:
+    """Checks that git selects every file the analyzer keeps for the wildcard path filters
+
+    git may select more files than the analyzer, parse_commit skips those.
+
+    Args:
+        repo_path (str): Repository path
+        filter_by_extension (list[str]): Extensions combined with every path filter
+
+    Returns:
+        bool: True if no file kept by the analyzer is missing from git's selection
+    """
+    files = list_files(repo_path, [])
+    matches = True
+    for scope in WILDCARD_SCOPES:
+        pathspecs = analyzer.build_pathspecs([], filter_by_extension, [scope])
+        kept = {file_path for file_path in files
+                if path.splitext(file_path)[1] in filter_by_extension
+                and analyzer.is_path_in_scope(file_path, [scope])}
+        missing = kept - set(list_files(repo_path, pathspecs))
+        if len(missing) > 0:
+            print(f"   git doesn't select {len(missing)} of {len(kept)} files in {scope}, ex. {min(missing)}")
+            matches = False
+    return matches
+
+
+def benchmark_scale(scale: str, config: SyntheticRepoConfig) -> dict:
+    """Times the analyzer stages on one repository
+
+    Args:
+        scale (str): Scale name
+        config (SyntheticRepoConfig): Shape of the repository
+
+    Returns:
+        dict: Repository shape, stage timings, analyzer counters and the pushdown check
+    """
+    repo_path = get_repository(scale, config)
+    print(f" * Benchmarking {scale}")
+    stages: dict[str, dict] = {}
+    stats = analyzer.RunStats()
+
+    def parse():
+        nonlocal stats
+        stats = analyzer.RunStats()
+        # the analyzer prints every commit, keep that out of the benchmark output
+        with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+            return analyzer.parse_commits(repo_path, [], [".c", ".cpp"], [], stats)
+
+    stages["parse_commits"], data = time_stage(parse, PARSE_REPEAT)
+    stages["group_data_by_file"], grouped_by_file = time_stage(
+        lambda: analyzer.group_data_by_file(data), STAGE_REPEAT)
+    stages["group_data_by_date"], _ = time_stage(lambda: analyzer.group_data_by_date(data), STAGE_REPEAT)
+    stages["get_list_of_files"], _ = time_stage(lambda: analyzer.get_list_of_files(data), STAGE_REPEAT)
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_file_name = path.join(output_dir, "output")
+        stages["write_data_to_json"], _ = time_stage(
+            lambda: analyzer.write_data_to_json(output_file_name, grouped_by_file), STAGE_REPEAT)
+
+    for name, timing in stages.items():
+        print(f"   {name:<20} {timing['median']:10.4f} s")
+
+    pushdown_matches = check_pushdown(repo_path, data)
+    pushdown_matches = check_pathspecs(repo_path, [".c"]) and pushdown_matches
+    return dict(repository=asdict(config), rows=len(data), stages=stages, analyzer=stats.summary(),
+                pushdown_matches=pushdown_matches)
+
+
+def get_environment() -> dict:
+    """Gets the versions the results depend on
+
+    Returns:
+        dict: Python, library and git versions, analyzer revision
+    """
+    revision = subprocess.run(["git", "-C", path.dirname(path.abspath(analyzer.__file__)), "describe",
+                               "--always", "--dirty"], capture_output=True, text=True).stdout.strip()
+    git_version = subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip()
+    return dict(python=platform.python_version(), platform=platform.platform(), pydriller=version("pydriller"),
+                lizard=version("lizard"), git=git_version, revision=revision)
+
+
+def compare_results(results: dict, baseline: dict) -> list[str]:
+    """Compares stage timings against a previous run
+
+    Args:
+        results (dict): Current results
+        baseline (dict): Previous results
+
+    Returns:
+        list[str]: Regressed stages as "scale/stage" names
+    """
+    regressions: list[str] = []
+    print(f" * Compared with {baseline['environment']['revision']} ({baseline['created']})")
+    for scale, scale_results in results["scales"].items():
+        baseline_scale = baseline["scales"].get(scale)
+        if baseline_scale is None or baseline_scale["repository"] != scale_results["repository"]:
+            print(f"   {scale}: no matching baseline")
+            continue
+        for name, timing in scale_results["stages"].items():
+            baseline_timing = baseline_scale["stages"].get(name)
+            if baseline_timing is None or baseline_timing["min"] == 0:
+                continue
+            ratio = timing["min"] / baseline_timing["min"]
+            marker = ""
+            if ratio > REGRESSION_RATIO and timing["min"] - baseline_timing["min"] > REGRESSION_MIN_SECONDS:
+                marker = " REGRESSION"
+                regressions.append(f"{scale}/{name}")
+            print(f"   {scale}/{name:<20} {baseline_timing['min']:10.4f} -> {timing['min']:10.4f} s "
+                  f"({ratio:.2f}x){marker}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=DEFAULT_SCALES,
+                        help="repository sizes to run")
+    parser.add_argument("--output", default="",
+                        help="results file name without .json, by default a timestamped file in benchmarks/results")
+    parser.add_argument("--compare", default="", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    print("::: [ Repository Analyzer Benchmarks ] :::")
+    created = datetime.now(timezone.utc)
+    results = dict(created=created.isoformat(timespec="seconds"), environment=get_environment(),
+                   scales={scale: benchmark_scale(scale, SCALES[scale]) for scale in args.scales})
+
+    output_file_name = args.output
+    if not output_file_name:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_file_name = path.join(RESULTS_DIR, created.strftime("%Y%m%d-%H%M%S"))
+    analyzer.write_data_to_json(output_file_name, results)
+    print(f" * Results written to {output_file_name}.json")
+
+    mismatched = [scale for scale, scale_results in results["scales"].items()
+                  if not scale_results["pushdown_matches"]]
+    if len(mismatched) > 0:
+        print(f" * Filtered history differs from the whole history: {', '.join(mismatched)}")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            regressions = compare_results(results, json.load(baseline_file))
+        if len(regressions) > 0:
+            print(f" * Slower stages: {', '.join(regressions)}")
+            sys.exit(1)
+
+    print(" * Done")
@@ -0,0 +1,168 @@
+"""Deterministic synthetic git repositories for the benchmarks
+
+The history is streamed to git fast-import, so repositories with 100k commits
+are generated in seconds. The same configuration and seed always give the
+same commit hashes.
+"""
+import random
+import subprocess
+from dataclasses import dataclass
+
+
+# First commit time and the time between commits
+START_TIMESTAMP: int = 1_600_000_000
+COMMIT_INTERVAL: int = 600
+
+# Author time zones, picked per author
+UTC_OFFSETS: list[str] = ["+0000", "+0100", "+0200", "-0500", "+0530"]
+
+# Statements used to build the function bodies
+STATEMENTS: list[str] = [
+    "    if (x > {n}) {{\n        x -= {n};\n    }}\n",
+    "    for (int i = 0; i < {n}; i++) {{\n        x += i;\n    }}\n",
+    "    while (x > {n} && y < {n}) {{\n        x--;\n        y++;\n    }}\n",
+    "    switch (x) {{\n    case {n}:\n        y = {n};\n        break;\n    default:\n        y = 0;\n    }}\n",
+    "    x = (y > {n}) ? x : y;\n",
+    "    y = x * {n} + y;\n",
+    "    x = y - {n};\n",
+]
+
+
+@dataclass
+class SyntheticRepoConfig:
+    """Shape of a generated repository
+    """
+    commits: int = 1000
+    files: int = 50
+    functions_per_file: int = 8
+    # statements per function, picked between the two values
+    min_function_size: int = 2
+    max_function_size: int = 20
+    # branches besides main, each is merged back into main and restarted
+    branches: int = 4
+    authors: int = 10
+    # files changed by each commit, picked between 1 and this value
+    max_files_per_commit: int = 3
+    # share of the files that are C++ (.cpp), the others are C (.c)
+    cpp_ratio: float = 0.5
+    seed: int = 1
+
+
+def _function_source(rng: random.Random, name: str, config: SyntheticRepoConfig) -> str:
+    """Generates one C function
+
+    Args:
+        rng (random.Random): Random number generator
+        name (str): Function name
+        config (SyntheticRepoConfig): Function size limits
+
+    Returns:
+        str: Function source
+    """
+    size = rng.randint(config.min_function_size, config.max_function_size)
+    body = "".join(rng.choice(STATEMENTS).format(n=rng.randint(1, 100)) for _ in range(size))
+    return f"int {name}(int x, int y)\n{{\n{body}    return x + y;\n}}\n\n"
+
+
+def _fast_import_data(content: str) -> bytes:
+    data = content.encode("utf-8")
+    return b"data %d\n%s\n" % (len(data), data)
+
+
+def generate_history(config: SyntheticRepoConfig):
+    """Generates the git fast-import stream of a synthetic history
+
+    Commits go to main or to one of the branches in turn. A branch that had a
+    few commits is merged into main, the merge keeps the main files, and the
+    branch restarts from the merge.
+
+    Args:
+        config (SyntheticRepoConfig): Shape of the repository
+
+    Yields:
+        bytes: Parts of the fast-import stream
+    """
+    rng = random.Random(config.seed)
+    paths = [f"src/module{i // 20}/file{i}{'.cpp' if rng.random() < config.cpp_ratio else '.c'}"
+             for i in range(config.files)]
+    authors = [(f"Developer {i}", f"dev{i}@example.com", rng.choice(UTC_OFFSETS)) for i in range(config.authors)]
+
+    # file contents per branch, a tuple of function sources per file
+    main_files: dict[str, tuple[str, ...]] = {}
+    branch_names = ["main"] + [f"branch{i}" for i in range(config.branches)]
+    branch_files: dict[str, dict[str, tuple[str, ...]]] = {}
+    branch_heads: dict[str, int] = {}
+    branch_commits: dict[str, int] = {name: 0 for name in branch_names}
+
+    for mark in range(1, config.commits + 1):
+        name, email, utc_offset = authors[rng.randrange(len(authors))]
+        timestamp = START_TIMESTAMP + mark * COMMIT_INTERVAL
+        branch = "main" if mark <= config.files // config.max_files_per_commit + 1 else rng.choice(branch_names)
+        if branch != "main" and branch not in branch_files:
+            # start the branch from the current main
+            branch_files[branch] = dict(main_files)
+            parent = branch_heads["main"]
+        else:
+            parent = branch_heads.get(branch)
+        files = main_files if branch == "main" else branch_files[branch]
+
+        header = [f"commit refs/heads/{branch}", f"mark :{mark}",
+                  f"author {name} <{email}> {timestamp} {utc_offset}",
+                  f"committer {name} <{email}> {timestamp} {utc_offset}"]
+        message = f"Change {mark} on {branch}"
+
+        if branch != "main" and branch_commits[branch] >= 5 and rng.random() < 0.3:
+            # merge the branch into main, main keeps its files
+            yield ("\n".join(["commit refs/heads/main", f"mark :{mark}", *header[2:]]) + "\n").encode("utf-8")
+            yield _fast_import_data(f"Merge {branch} into main")
+            yield f"from :{branch_heads['main']}\nmerge :{branch_heads[branch]}\n\n".encode("utf-8")
+            branch_heads["main"] = mark
+            del branch_files[branch]
+            branch_commits[branch] = 0
+            continue
+
+        if len(files) < len(paths):
+            # add the files in order until all exist
+            changed = paths[len(files):len(files) + config.max_files_per_commit]
+        else:
+            changed = rng.sample(paths, rng.randint(1, config.max_files_per_commit))
+
+        yield ("\n".join(header) + "\n").encode("utf-8")
+        yield _fast_import_data(message)
+        if parent is not None:
+            yield f"from :{parent}\n".encode("utf-8")
+        for file_path in changed:
+            stem = file_path.rsplit("/", 1)[-1].split(".")[0]
+            functions = files.get(file_path)
+            if functions is None:
+                functions = tuple(_function_source(rng, f"{stem}_f{i}", config)
+                                  for i in range(config.functions_per_file))
+            else:
+                index = rng.randrange(len(functions))
+                functions = functions[:index] + (_function_source(rng, f"{stem}_f{index}", config),) \
+                    + functions[index + 1:]
+            files[file_path] = functions
+            yield f"M 100644 inline {file_path}\n".encode("utf-8")
+            yield _fast_import_data("".join(functions))
+        yield b"\n"
+
+        branch_heads[branch] = mark
+        branch_commits[branch] += 1
+
+
+def generate_repository(repo_path: str, config: SyntheticRepoConfig):
+    """Creates a git repository with a synthetic history
+
+    Args:
+        repo_path (str): Path of the new repository, must not exist
+        config (SyntheticRepoConfig): Shape of the repository
+    """
+    subprocess.run(["git", "init", "--quiet", "--initial-branch=main", repo_path], check=True)
+    with subprocess.Popen(["git", "-C", repo_path, "fast-import", "--quiet"], stdin=subprocess.PIPE) as process:
+        for chunk in generate_history(config):
+            process.stdin.write(chunk)
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"git fast-import failed for {repo_path}")
+    # check out main so the repository looks like a normal clone
+    subprocess.run(["git", "-C", repo_path, "checkout", "--quiet", "--force", "main"], check=True)
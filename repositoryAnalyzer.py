@@ -1,227 +1,2532 @@
-"""Git repository cyclomatic complexity analyzer exports data into a JSON format
-"""
-
-import json
-from os import path
-from itertools import groupby
-from dataclasses import dataclass
-from pydriller import Repository
-
-# Path to the repository (absolute or relative path)
-REPO_PATH: str = "/home/user/repository"
-
-# Filter repository to only what is needed, empty lists don't filter anything
-FILTER_USER_EMAIL: list[str] = []
-FILTER_FILE_NAMES: list[str] = []
-FILTER_FILE_TYPES: list[str] = ['.c', '.cpp']
-
-# Output file name
-OUTPUT_FILE_NAME: str = "output"
-
-
-@dataclass
-class ParsedCommit:
-    """Contains parsed commit data
-    """
-
-    def __init__(self,
-                 commit_hash: str, commit_date: str, user_name: str,
-                 user_email: str, file_name: str, complexity: int,
-                 avg_complexity: float, branches: set[str]):
-
-        self.hash: str = commit_hash
-        self.date: str = commit_date
-        self.user: str = user_name
-        self.email: str = user_email
-        self.branches: list[str] = sorted(list(branches))
-        self.file_name: str = file_name
-        self.ccn: int = complexity
-        # self.avgCCN: str = "%.3f" % avg_complexity
-        self.avg_ccn: float = avg_complexity
-
-    def __repr__(self) -> str:
-        return f"{self.hash}, {self.date}, {self.user}, {self.email}, {self.file_name}, {self.ccn}, {self.avg_ccn}"
-
-
-def parse_commits(repo_path: str, filter_by_name: list[str], filter_by_extension: list[str], filter_by_email: list[str]) -> list[ParsedCommit]:
-    """Extracts information form the commits on the repository path
-
-    Args:
-        repo_path (str): Repository path, local or remote
-        filter_by_extension (list[str]): list of extensions to filter files by, ex. .c, .cpp, .py
-
-    Returns:
-        list[ParsedCommit]: List of LinearHistory objects containing parsed data
-    """
-    linear_history_list: list = []
-
-    repo = Repository(repo_path)
-    list_of_commits = repo.traverse_commits()
-
-    for commit in list_of_commits:
-        date = str(commit.author_date)
-        git_hash = str(commit.hash)
-        user = str(commit.author.name)
-        email = str(commit.author.email)
-        branches_list = commit.branches
-        # skip commits without proper user email
-        if (email not in filter_by_email) and (len(filter_by_email) > 0):
-            continue
-
-        print(f"\tcommit: {date} by {user} ({email})")
-        if commit.modified_files is None:
-            print(f"*** MERGE {git_hash} @ {date} by {user} ({email}) ***")
-
-        for file in commit.modified_files:
-            file_name, file_ext = path.splitext(file.filename)
-            complexity = file.complexity
-
-            # Skip files name that are not in the filter
-            if (file_name not in filter_by_name) and (len(filter_by_name) > 0):
-                continue
-            # Skip files extensions that are not in the filter
-            if (file_ext not in filter_by_extension) and (len(filter_by_extension) > 0):
-                continue
-            # Skip if file has no complexity
-            if complexity is None:
-                print(
-                    f"\t - skipped: {file_name}{file_ext}")
-                print(commit.msg)
-                continue
-
-            num_of_methods: int = len(file.methods)
-            avg_complexity: float = 0
-
-            if num_of_methods > 0:
-                avg_complexity = complexity / num_of_methods
-            else:
-                avg_complexity = 0
-
-            linear_history_list.append(
-                ParsedCommit(commit_hash=git_hash,
-                             commit_date=date,
-                             user_name=user,
-                             user_email=email,
-                             file_name=file_name,
-                             complexity=complexity,
-                             avg_complexity=avg_complexity,
-                             branches=branches_list))
-
-    return linear_history_list
-
-
-def get_list_of_files(data: list[ParsedCommit]) -> list[str]:
-    """Gets a list of files from parsed commit data
-
-    Args:
-        data (list[ParsedCommit]): List of ParsedCommit objects containing parsed data
-
-    Returns:
-        list[str]: List of file names
-    """
-    list_of_files = list()
-
-    for item in data:
-        if item.file_name not in list_of_files:
-            list_of_files.append(item.file_name)
-
-    return sorted(list_of_files)
-
-
-def get_list_of_user_emails(data: list[ParsedCommit]) -> list[str]:
-    """Gets a list of users from the parsed commit data
-
-    Args:
-        data (list[ParsedCommit]): List of ParsedCommit objects containing parsed data
-
-    Returns:
-        list[str]: List of user emails
-    """
-    list_of_emails = list()
-
-    for item in data:
-        if item.email not in list_of_emails:
-            list_of_emails.append(item.email)
-
-    return sorted(list_of_emails)
-
-
-def write_data_to_json(output_file_name: str, data):
-    """Writes data to a JSON file
-
-    Args:
-        output_file_name (str): File name
-        data (Any): List or Dictionary
-    """
-    json_object = json.dumps(data, indent=2)
-    with open(output_file_name+'.json', "w", encoding="utf-8") as f:
-        f.write(json_object)
-
-
-def group_data_by_date(input_data: list[ParsedCommit]) -> list:
-    """Group data by date
-    """
-    # Sort items by file
-    input_data.sort(key=lambda x: x.date)
-    # Group items by file
-    grouped = [list(result) for key, result in groupby(
-        input_data, key=lambda x: x.hash)]
-
-    data = []
-    for group in grouped:
-        record = dict(
-            hash=group[0].hash,
-            timestamp=group[0].date,
-            user=group[0].user,
-            user_email=group[0].email,
-            branches=group[0].branches
-        )
-        for item in group:
-            record[item.file_name] = f"{item.avg_ccn:.3f}"
-        data.append(record)
-    return data
-
-
-def group_data_by_file(input_data: list[ParsedCommit]) -> list:
-    """Group data by file name
-    """
-    # Sort items by file
-    input_data.sort(key=lambda x: x.file_name)
-    # Group items by file
-    grouped = [list(result) for key, result in groupby(
-        input_data, key=lambda x: x.file_name)]
-
-    data = []
-    for group in grouped:
-        file_name = group[0].file_name
-
-        record = dict(filename=file_name)
-        for item in group:
-            record[item.date] = f'{item.avg_ccn:.3f}'
-
-        data.append(record)
-
-    return data
-
-
-if __name__ == '__main__':
-
-    print("::: [ Git Repository Analyzer ] :::")
-    print(" * Parsing commits ...")
-    parsed_commit_list = parse_commits(
-        REPO_PATH, FILTER_FILE_NAMES, FILTER_FILE_TYPES, FILTER_USER_EMAIL)
-    print(" * Commit parsing done")
-
-    file_list = get_list_of_files(parsed_commit_list)
-    email_list = get_list_of_user_emails(parsed_commit_list)
-
-    # grouped_data = group_data_by_date(parsed_commit_list)
-    grouped_data = group_data_by_file(parsed_commit_list)
-
-    print(" * Write a JSON files")
-    write_data_to_json(OUTPUT_FILE_NAME, grouped_data)
-    write_data_to_json(OUTPUT_FILE_NAME+'_file_list', file_list)
-    write_data_to_json(OUTPUT_FILE_NAME+'_email_list', email_list)
-
-    print(" * Done")
-    exit(0)
+"""Git repository cyclomatic complexity analyzer exports data into a JSON format
+"""
+
+import os
+import json
+import time
+import argparse
+import sqlite3
+import re
+import hashlib
+import difflib
+import fnmatch
+import subprocess
+from importlib.metadata import version
+from os import path, getpid
+from datetime import datetime, timedelta, timezone
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import repeat
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import lru_cache
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+import lizard
+import lizard_languages
+from git import Repo as GitPythonRepo, NULL_TREE
+from pydriller import Repository, Commit
+
+try:
+    import numpy as np
+except ImportError:
+    # optional, only needed to write the complexity matrix
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # optional, only needed to write Parquet output
+    pa = pq = None
+
+# Path to the repository (absolute or relative path)
+REPO_PATH: str = "/home/user/repository"
+
+# Filter repository to only what is needed, empty lists don't filter anything
+FILTER_USER_EMAIL: list[str] = []
+FILTER_FILE_NAMES: list[str] = []
+FILTER_FILE_TYPES: list[str] = ['.c', '.cpp']
+# Directories or globs (relative to the repository root) to limit the analysis to, ex. src/net, lib/*/core
+FILTER_PATHS: list[str] = []
+
+# Part of the history to analyze, empty strings don't limit anything.
+# Dates are ISO 8601 (ex. 2024-01-31), revisions are hashes, tags or branches.
+# FROM_REVISION itself is excluded like in git's FROM..TO, so consecutive ranges don't overlap.
+SINCE_DATE: str = ""
+UNTIL_DATE: str = ""
+FROM_REVISION: str = ""
+TO_REVISION: str = ""
+
+# Number of worker processes used to parse commits, 1 disables the process pool
+WORKERS: int = 1
+# Upper bound of commits handed to a worker process at once, the "approximate"
+# engine also starts over every COMMITS_PER_CHUNK commits, so its estimates change with it
+COMMITS_PER_CHUNK: int = 64
+
+# Complexity engine: "lizard" parses every changed file, "incremental" parses
+# only the functions touched by the changes and reuses the previous revision's results,
+# "approximate" estimates C and C++ files and parses them only when the estimate changed a lot
+COMPLEXITY_ENGINE: str = "lizard"
+# Function tables of file revisions kept by the "incremental" engine
+INCREMENTAL_TABLE_SIZE: int = 100_000
+# Relative change of the estimate since the last lizard parse of a file that runs lizard again
+APPROXIMATE_TOLERANCE: float = 0.1
+# Lizard results of file revisions kept by the "approximate" engine
+APPROXIMATE_STATE_SIZE: int = 100_000
+
+# Minimum similarity (%) of a deleted and an added file to be seen as a rename,
+# 0 disables rename detection and renamed files are a deletion and an addition
+RENAME_SIMILARITY: int = 50
+
+# Reader of file contents: "cat-file" keeps git cat-file --batch processes open,
+# "gitpython" reads through GitPython. There is no in-process pack file reader,
+# applying git deltas in Python was measured 2.5x slower than cat-file
+BLOB_READER: str = "cat-file"
+# Number of git cat-file processes per analyzing process
+BLOB_READER_PROCESSES: int = 2
+
+# SQLite file keeping already analyzed commits between runs, empty string disables it
+STORE_FILE_NAME: str = ""
+
+# SQLite file with the progress of the current run, written every COMMITS_PER_CHUNK
+# commits and removed when the run completes, --resume continues from it.
+# Not used with STORE_FILE_NAME, which keeps the progress too
+CHECKPOINT_FILE_NAME: str = "checkpoint.db"
+
+# SQLite file caching lizard results by file content (git blob id), empty string disables it
+COMPLEXITY_CACHE_FILE_NAME: str = ""
+# Maximum number of cached blobs, least recently used blobs are evicted
+COMPLEXITY_CACHE_SIZE: int = 1_000_000
+
+# Find the branches containing each commit, disable to leave branch lists empty
+COLLECT_BRANCHES: bool = True
+
+# Run summary with stage timings and counters (JSON), empty string disables it
+RUN_SUMMARY_FILE_NAME: str = "run_summary"
+
+# Chrome/Perfetto trace of the commits and files (JSON), empty string disables it
+TRACE_FILE_NAME: str = ""
+
+# Output file name
+OUTPUT_FILE_NAME: str = "output"
+# Group output data by "file" or by "date"
+OUTPUT_GROUP_BY: str = "file"
+# Write JSON without indentation and whitespace
+OUTPUT_COMPACT: bool = False
+# Also write a files x commits matrix of average complexity (.npz, requires numpy)
+OUTPUT_MATRIX: bool = False
+# Also write the parsed data as a Parquet table (requires pyarrow)
+OUTPUT_PARQUET: bool = False
+# Number of rows written to the Parquet file at once
+PARQUET_ROW_GROUP_SIZE: int = 100_000
+# Also write the parsed data into SQLite tables with query indexes
+OUTPUT_SQLITE: bool = False
+# Number of rows inserted into the SQLite output in one transaction
+SQLITE_BATCH_SIZE: int = 10_000
+
+
+@dataclass
+class ParsedCommit:
+    """Contains parsed commit data
+    """
+
+    def __init__(self,
+                 commit_hash: str, commit_timestamp: int, utc_offset: int, user_name: str,
+                 user_email: str, file_name: str, complexity: int,
+                 avg_complexity: float, branches: set[str]):
+
+        self.hash: str = commit_hash
+        # UTC epoch seconds, the author's UTC offset (seconds east of UTC) is kept separately
+        self.timestamp: int = commit_timestamp
+        self.utc_offset: int = utc_offset
+        self.user: str = user_name
+        self.email: str = user_email
+        self.branches: list[str] = sorted(list(branches))
+        self.file_name: str = file_name
+        self.ccn: int = complexity
+        # self.avgCCN: str = "%.3f" % avg_complexity
+        self.avg_ccn: float = avg_complexity
+
+    @property
+    def date(self) -> str:
+        """Commit date in the author's time zone, ex. 2020-01-01 10:00:00+02:00
+        """
+        time_zone = timezone(timedelta(seconds=self.utc_offset))
+        return str(datetime.fromtimestamp(self.timestamp, time_zone))
+
+    def __repr__(self) -> str:
+        return f"{self.hash}, {self.date}, {self.user}, {self.email}, {self.file_name}, {self.ccn}, {self.avg_ccn}"
+
+
+class StringTable:
+    """Interns strings as integer IDs
+    """
+
+    def __init__(self):
+        self.values: list = []
+        self._ids: dict = {}
+
+    def intern(self, value) -> int:
+        """Gets the ID of a value, adding it when it's new
+
+        Args:
+            value (Hashable): String or tuple of strings
+
+        Returns:
+            int: ID of the value
+        """
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self._ids[value] = value_id
+            self.values.append(value)
+        return value_id
+
+
+class ParsedCommitTable:
+    """Compact columnar storage of ParsedCommit rows
+
+    Fields shared by all files of a commit are kept once in the commit table,
+    the measurement table holds only typed array columns. File names, users,
+    emails and branch lists are interned as integer IDs.
+    """
+
+    def __init__(self, data: Iterable[ParsedCommit] = ()):
+        self.files = StringTable()
+        self.users = StringTable()
+        self.emails = StringTable()
+        self.branches = StringTable()
+
+        # commit table
+        self.commit_hash: list[str] = []
+        self.commit_timestamp: array = array("q")
+        self.commit_utc_offset: array = array("i")
+        self.commit_user: array = array("I")
+        self.commit_email: array = array("I")
+        self.commit_branches: array = array("I")
+
+        # measurement table
+        self.commit_index: array = array("I")
+        self.file: array = array("I")
+        self.ccn: array = array("q")
+        self.avg_ccn: array = array("d")
+
+        self.extend(data)
+
+    def __len__(self) -> int:
+        return len(self.commit_index)
+
+    def append(self, item: ParsedCommit):
+        """Adds a row, rows of a commit have to be added one after another
+
+        Args:
+            item (ParsedCommit): Parsed data
+        """
+        if len(self.commit_hash) == 0 or self.commit_hash[-1] != item.hash:
+            self.commit_hash.append(item.hash)
+            self.commit_timestamp.append(item.timestamp)
+            self.commit_utc_offset.append(item.utc_offset)
+            self.commit_user.append(self.users.intern(item.user))
+            self.commit_email.append(self.emails.intern(item.email))
+            self.commit_branches.append(self.branches.intern(tuple(item.branches)))
+
+        self.commit_index.append(len(self.commit_hash) - 1)
+        self.file.append(self.files.intern(item.file_name))
+        self.ccn.append(item.ccn)
+        self.avg_ccn.append(item.avg_ccn)
+
+    def extend(self, data: Iterable[ParsedCommit]):
+        """Adds rows
+
+        Args:
+            data (Iterable[ParsedCommit]): Parsed data
+        """
+        for item in data:
+            self.append(item)
+
+    def __iter__(self) -> Iterator[ParsedCommit]:
+        for row, commit in enumerate(self.commit_index):
+            yield ParsedCommit(commit_hash=self.commit_hash[commit],
+                               commit_timestamp=self.commit_timestamp[commit],
+                               utc_offset=self.commit_utc_offset[commit],
+                               user_name=self.users.values[self.commit_user[commit]],
+                               user_email=self.emails.values[self.commit_email[commit]],
+                               file_name=self.files.values[self.file[row]],
+                               complexity=self.ccn[row],
+                               avg_complexity=self.avg_ccn[row],
+                               branches=self.branches.values[self.commit_branches[commit]])
+
+
+class TraceWriter:
+    """Writes Chrome trace events, viewable in Perfetto or chrome://tracing
+
+    Events are written to the file as they are added. Without a file name the
+    events are kept in a list, worker processes send that list to the main
+    process which writes it.
+    """
+
+    def __init__(self, file_name: str = ""):
+        self.events: list[dict] = []
+        self._file = None
+        self._separator = ""
+        if file_name:
+            self._file = open(f"{file_name}.json", "w", encoding="utf-8")
+            self._file.write("[")
+
+    def complete(self, name: str, category: str, start: float, duration: float, args: dict | None = None):
+        """Adds a span
+
+        Args:
+            name (str): Span name
+            category (str): Span category, used to filter spans in the viewer
+            start (float): Start time, from time.perf_counter()
+            duration (float): Duration in seconds
+            args (dict, optional): Details shown for the span
+        """
+        pid = getpid()
+        event = dict(name=name, cat=category, ph="X", ts=round(start * 1e6, 3), dur=round(duration * 1e6, 3),
+                     pid=pid, tid=pid)
+        if args:
+            event["args"] = args
+        self._write(event)
+
+    def extend(self, events: list[dict]):
+        """Adds spans collected by a worker process
+
+        Args:
+            events (list[dict]): Trace events
+        """
+        for event in events:
+            self._write(event)
+
+    def _write(self, event: dict):
+        if self._file is None:
+            self.events.append(event)
+        else:
+            self._file.write(self._separator + "\n" + json.dumps(event, separators=(",", ":")))
+            self._separator = ","
+
+    def close(self):
+        """Ends the JSON array and closes the file
+        """
+        if self._file is not None:
+            self._file.write("\n]\n")
+            self._file.close()
+            self._file = None
+
+
+class StageTimer:
+    """Accumulates wall time per processing stage and the parse time of every file
+    """
+
+    def __init__(self):
+        self.seconds: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self.file_parse_seconds: array = array("d")
+        # spans are only recorded when a trace writer is set
+        self.trace: TraceWriter | None = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times the enclosed block as a stage
+
+        Args:
+            name (str): Stage name, time of blocks with the same name is summed
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    @contextmanager
+    def span(self, name: str, category: str, **args):
+        """Records the enclosed block as a trace span, does nothing without a trace writer
+
+        Args:
+            name (str): Span name
+            category (str): Span category
+            **args: Details shown for the span
+        """
+        if self.trace is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.trace.complete(name, category, start, time.perf_counter() - start, args)
+
+    def add(self, name: str, seconds: float):
+        """Adds time to a stage
+
+        Args:
+            name (str): Stage name
+            seconds (float): Elapsed time
+        """
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def merge(self, other: "StageTimer"):
+        """Adds timings collected by a worker process
+
+        Args:
+            other (StageTimer): Timings to add
+        """
+        for name, seconds in other.seconds.items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + other.calls[name]
+        self.file_parse_seconds.extend(other.file_parse_seconds)
+        if self.trace is not None and other.trace is not None:
+            self.trace.extend(other.trace.events)
+
+    def summary(self) -> dict:
+        """Gets the timings as a dictionary
+
+        Returns:
+            dict: Total seconds and calls per stage, file parse latency percentiles
+        """
+        stages = {name: dict(seconds=round(seconds, 6), calls=self.calls[name])
+                  for name, seconds in sorted(self.seconds.items(), key=lambda x: -x[1])}
+
+        latencies = sorted(self.file_parse_seconds)
+        file_parse = dict(count=len(latencies))
+        if len(latencies) > 0:
+            for percentile in (50, 90, 99):
+                # nearest rank
+                rank = max(0, -(-percentile * len(latencies) // 100) - 1)
+                file_parse[f"p{percentile}"] = round(latencies[rank], 6)
+            file_parse["max"] = round(latencies[-1], 6)
+            file_parse["mean"] = round(sum(latencies) / len(latencies), 6)
+
+        return dict(stages=stages, file_parse_seconds=file_parse)
+
+
+@dataclass
+class RunStats:
+    """Counters and stage timings of an analysis run
+    """
+    commits_total: int = 0
+    commits_skipped: int = 0
+    commits_stored: int = 0
+    commits_parsed: int = 0
+    files_parsed: int = 0
+    files_skipped: int = 0
+    files_without_complexity: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    timer: StageTimer = field(default_factory=StageTimer)
+
+    def __str__(self) -> str:
+        return (f"commits skipped {self.commits_skipped}/{self.commits_total}, "
+                f"commits loaded from store {self.commits_stored}, "
+                f"files skipped {self.files_skipped}/{self.files_skipped + self.files_parsed}, "
+                f"complexity cache hits {self.cache_hits}/{self.cache_hits + self.cache_misses}")
+
+    def merge(self, other: "RunStats"):
+        """Adds counters collected by a worker process
+
+        Args:
+            other (RunStats): Counters to add, commits_total is not summed
+        """
+        self.commits_skipped += other.commits_skipped
+        self.commits_parsed += other.commits_parsed
+        self.files_parsed += other.files_parsed
+        self.files_skipped += other.files_skipped
+        self.files_without_complexity += other.files_without_complexity
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.timer.merge(other.timer)
+
+    def summary(self) -> dict:
+        """Gets the counters and timings as a dictionary
+
+        Returns:
+            dict: Run summary
+        """
+        counters = dict(commits_total=self.commits_total,
+                        commits_skipped=self.commits_skipped,
+                        commits_stored=self.commits_stored,
+                        commits_parsed=self.commits_parsed,
+                        files_parsed=self.files_parsed,
+                        files_skipped=self.files_skipped,
+                        files_without_complexity=self.files_without_complexity,
+                        cache_hits=self.cache_hits,
+                        cache_misses=self.cache_misses)
+        return dict(counters=counters, **self.timer.summary())
+
+
+def get_measurement_settings() -> dict:
+    """Gets the settings, besides the filters, that change the measured complexities
+
+    Returns:
+        dict: Rename similarity, complexity engine and the tolerance of the approximate engine
+    """
+    return dict(rename_similarity=RENAME_SIMILARITY,
+                complexity_engine=COMPLEXITY_ENGINE,
+                approximate_tolerance=APPROXIMATE_TOLERANCE if COMPLEXITY_ENGINE == "approximate" else None)
+
+
+class AnalysisStore:
+    """On-disk store of parsed commits, keyed by commit hash and a fingerprint
+    of the analysis configuration
+
+    Commits are immutable, so a commit analyzed once with the same filters and
+    tool versions never has to be analyzed again. Branch lists are stored as
+    they were at the time of the analysis.
+    """
+
+    SCHEMA_VERSION: int = 2
+
+    def __init__(self, file_name: str, filter_by_name: list[str], filter_by_extension: list[str],
+                 filter_by_email: list[str], filter_by_path: list[str] | None = None):
+        config = dict(names=sorted(filter_by_name),
+                      extensions=sorted(filter_by_extension),
+                      emails=sorted(filter_by_email),
+                      paths=sorted(filter_by_path or []),
+                      pydriller=version("pydriller"),
+                      lizard=version("lizard"),
+                      **get_measurement_settings())
+        self.fingerprint: str = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+        self._db = sqlite3.connect(file_name)
+        (schema_version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if schema_version != self.SCHEMA_VERSION:
+            # stores written by older versions can't be read, analyze again
+            self._db.executescript("""
+                DROP TABLE IF EXISTS commits;
+                DROP TABLE IF EXISTS measurements;
+            """)
+            self._db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS commits (
+                fingerprint TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (fingerprint, hash));
+            CREATE TABLE IF NOT EXISTS measurements (
+                fingerprint TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                timestamp INTEGER,
+                utc_offset INTEGER,
+                user TEXT,
+                email TEXT,
+                branches TEXT,
+                file_name TEXT,
+                ccn INTEGER,
+                avg_ccn REAL);
+            CREATE INDEX IF NOT EXISTS measurements_commit ON measurements (fingerprint, hash);
+        """)
+
+    def analyzed_hashes(self) -> set[str]:
+        """Gets hashes of the commits already in the store
+
+        Returns:
+            set[str]: Commit hashes
+        """
+        rows = self._db.execute("SELECT hash FROM commits WHERE fingerprint = ?", (self.fingerprint,))
+        return {row[0] for row in rows}
+
+    def add(self, hashes: list[str], data: Iterable[ParsedCommit]):
+        """Stores analyzed commits in a single transaction
+
+        Args:
+            hashes (list[str]): Hashes of all analyzed commits, including those without data
+            data (Iterable[ParsedCommit]): Parsed data of the commits
+        """
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO commits VALUES (?, ?)",
+                                 [(self.fingerprint, git_hash) for git_hash in hashes])
+            self._db.executemany("INSERT INTO measurements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 ((self.fingerprint, item.hash, item.timestamp, item.utc_offset, item.user, item.email,
+                                   json.dumps(item.branches), item.file_name, item.ccn, item.avg_ccn)
+                                  for item in data))
+
+    def iter_data(self, hashes: Iterable[str]) -> Iterator[ParsedCommit]:
+        """Loads stored data one commit at a time
+
+        Args:
+            hashes (Iterable[str]): Commit hashes in the order of the returned data
+
+        Yields:
+            ParsedCommit: Stored parsed data
+        """
+        for git_hash in hashes:
+            rows = self._db.execute("SELECT timestamp, utc_offset, user, email, branches, file_name, ccn, avg_ccn "
+                                    "FROM measurements WHERE fingerprint = ? AND hash = ? ORDER BY rowid",
+                                    (self.fingerprint, git_hash))
+            for timestamp, utc_offset, user, email, branches, file_name, ccn, avg_ccn in rows:
+                yield ParsedCommit(commit_hash=git_hash,
+                                   commit_timestamp=timestamp,
+                                   utc_offset=utc_offset,
+                                   user_name=user,
+                                   user_email=email,
+                                   file_name=file_name,
+                                   complexity=ccn,
+                                   avg_complexity=avg_ccn,
+                                   branches=json.loads(branches))
+
+    def close(self):
+        """Closes the database
+        """
+        self._db.close()
+
+
+class ComplexityCache:
+    """Size-capped LRU cache of lizard results keyed by git blob id
+
+    Identical file content (merges, reverts, cherry-picks, copies) has the same
+    blob id, so it is parsed by lizard only once per machine. The number of
+    entries is counted when the cache is opened and then kept up to date, so
+    entries added by other processes sharing the file are only seen by the
+    next open.
+    """
+
+    def __init__(self, file_name: str, max_size: int):
+        self.file_name: str = file_name
+        self.max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._lizard_version: str = lizard.version
+        self._touched: dict[tuple[str, str], int] = {}
+        self._pending: int = 0
+
+        self._db = sqlite3.connect(file_name, timeout=60)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                blob TEXT NOT NULL,
+                lizard TEXT NOT NULL,
+                language TEXT NOT NULL,
+                ccn INTEGER,
+                methods INTEGER,
+                nloc INTEGER,
+                last_used INTEGER,
+                PRIMARY KEY (blob, lizard, language));
+            CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used);
+        """)
+        (self._size,) = self._db.execute("SELECT COUNT(*) FROM blobs").fetchone()
+
+    def get(self, blob_id: str, language: str) -> tuple[int, int, int] | None:
+        """Gets cached lizard results
+
+        Args:
+            blob_id (str): git blob id of the file content
+            language (str): lizard language reader
+
+        Returns:
+            tuple[int, int, int] | None: CCN, number of methods and NLOC, None on a miss
+        """
+        row = self._db.execute("SELECT ccn, methods, nloc FROM blobs WHERE blob = ? AND lizard = ? AND language = ?",
+                               (blob_id, self._lizard_version, language)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # last use is written in batches together with new entries
+        self._touched[(blob_id, language)] = time.time_ns()
+        return row
+
+    def put(self, blob_id: str, language: str, result: tuple[int, int, int]):
+        """Adds lizard results to the cache
+
+        Args:
+            blob_id (str): git blob id of the file content
+            language (str): lizard language reader
+            result (tuple[int, int, int]): CCN, number of methods and NLOC
+        """
+        inserted = self._db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    (blob_id, self._lizard_version, language, *result, time.time_ns()))
+        if inserted.rowcount > 0:
+            self._size += 1
+        else:
+            # another process added it since the miss
+            self._db.execute("UPDATE blobs SET ccn = ?, methods = ?, nloc = ?, last_used = ? "
+                             "WHERE blob = ? AND lizard = ? AND language = ?",
+                             (*result, time.time_ns(), blob_id, self._lizard_version, language))
+        self._pending += 1
+        if self._pending >= 256:
+            self.flush()
+
+    def flush(self):
+        """Writes pending entries and last use times, evicts least recently used entries
+        """
+        self._db.executemany("UPDATE blobs SET last_used = ? WHERE blob = ? AND lizard = ? AND language = ?",
+                             [(last_used, blob_id, self._lizard_version, language)
+                              for (blob_id, language), last_used in self._touched.items()])
+        if self._size > self.max_size:
+            evicted = self._db.execute("DELETE FROM blobs WHERE rowid IN "
+                                       "(SELECT rowid FROM blobs ORDER BY last_used LIMIT ?)",
+                                       (self._size - self.max_size,))
+            self._size -= evicted.rowcount
+        self._db.commit()
+        self._touched.clear()
+        self._pending = 0
+
+    def close(self):
+        """Flushes and closes the cache
+        """
+        self.flush()
+        self._db.close()
+
+
+@dataclass
+class ChangedFile:
+    """File changed by a commit, None paths are missing on that side (added or deleted files)
+    """
+    old_path: str | None
+    new_path: str | None
+    # id of the new content, None for deleted files
+    blob: str | None
+    # id of the previous content, None for added files
+    old_blob: str | None = None
+
+    @property
+    def filename(self) -> str:
+        """File name without the directories
+        """
+        return path.basename(self.new_path or self.old_path)
+
+
+@dataclass
+class CommitMetadata:
+    """Commit fields needed by the analysis, without the file contents
+    """
+    hash: str
+    timestamp: int
+    utc_offset: int
+    author_name: str
+    author_email: str
+    parents: list[str]
+    msg: str
+    # changed files compared to the first parent, empty for merge commits
+    files: list[ChangedFile]
+
+    @property
+    def date(self) -> str:
+        """Author date in the commit's time zone, formatted like str(datetime)
+        """
+        return str(datetime.fromtimestamp(self.timestamp, timezone(timedelta(seconds=self.utc_offset))))
+
+    @classmethod
+    def from_pydriller(cls, commit: Commit) -> "CommitMetadata":
+        """Gets the metadata of a pydriller commit, comparing its tree to the first parent's
+
+        Only the changed paths and blob ids are read, pydriller's modified
+        files would create a textual diff of every file.
+
+        Args:
+            commit (Commit): pydriller commit
+
+        Returns:
+            CommitMetadata: Commit metadata
+        """
+        author_date = commit.author_date
+        git_commit = commit._c_object  # pylint: disable=protected-access
+        files = []
+        # like pydriller, merge commits have no changed files
+        if len(git_commit.parents) <= 1:
+            renames = dict(find_renames=f"{RENAME_SIMILARITY}%") if RENAME_SIMILARITY > 0 else dict(no_renames=True)
+            if len(git_commit.parents) == 1:
+                diff_index = git_commit.parents[0].diff(git_commit, create_patch=False, **renames)
+            else:
+                diff_index = git_commit.diff(NULL_TREE, create_patch=False, **renames)
+            for diff in diff_index:
+                # deleted files and submodules have no content to read
+                has_blob = not diff.deleted_file and diff.b_blob is not None and diff.b_mode != 0o160000
+                has_old_blob = not diff.new_file and diff.a_blob is not None
+                files.append(ChangedFile(None if diff.new_file else diff.a_path,
+                                         None if diff.deleted_file else diff.b_path,
+                                         diff.b_blob.hexsha if has_blob else None,
+                                         diff.a_blob.hexsha if has_old_blob else None))
+        return cls(hash=commit.hash,
+                   timestamp=int(author_date.timestamp()),
+                   utc_offset=int(author_date.utcoffset().total_seconds()),
+                   author_name=commit.author.name,
+                   author_email=commit.author.email,
+                   parents=commit.parents,
+                   msg=commit.msg,
+                   files=files)
+
+
+class BlobReader(ABC):
+    """Reads file contents from a repository by blob id
+    """
+
+    @abstractmethod
+    def read(self, blob: str) -> bytes:
+        """Reads a blob
+
+        Args:
+            blob (str): Blob id
+
+        Returns:
+            bytes: File content
+        """
+
+    def prefetch(self, blobs: list[str]):
+        """Announces blobs that will be read next, so they can be read ahead
+
+        Args:
+            blobs (list[str]): Blob ids
+        """
+
+    def close(self):
+        """Releases the resources of the reader
+        """
+
+
+class GitBlobReader(BlobReader):
+    """Reads file contents through GitPython's object database
+    """
+
+    def __init__(self, repo_path: str):
+        self._odb = GitPythonRepo(repo_path).odb
+
+    def read(self, blob: str) -> bytes:
+        return self._odb.stream(bytes.fromhex(blob)).read()
+
+
+class CatFileBlobPool(BlobReader):
+    """Reads file contents from long-lived git cat-file --batch processes
+
+    Each blob id is always sent to the same process. Prefetched blobs are
+    requested from all processes at once, so git decompresses them in parallel
+    while the previous file is parsed, and the responses are collected in
+    request order.
+    """
+
+    # Requests in flight per process, small enough that the request pipe never fills
+    MAX_PENDING: int = 256
+
+    def __init__(self, repo_path: str, processes: int = 2):
+        self._processes = [subprocess.Popen(["git", "-C", repo_path, "cat-file", "--batch"],
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+                           for _ in range(max(1, processes))]
+        self._pending: list[list[str]] = [[] for _ in self._processes]
+        self._ready: dict[str, bytes] = {}
+
+    def _index(self, blob: str) -> int:
+        return int(blob[:8], 16) % len(self._processes)
+
+    def _request(self, index: int, blobs: list[str]):
+        process = self._processes[index]
+        process.stdin.write("".join(f"{blob}\n" for blob in blobs).encode())
+        process.stdin.flush()
+        self._pending[index].extend(blobs)
+
+    def _receive(self, index: int) -> tuple[str, bytes]:
+        """Reads the response to the oldest pending request of a process
+        """
+        stdout = self._processes[index].stdout
+        blob = self._pending[index].pop(0)
+        header = stdout.readline().split()
+        if len(header) != 3:
+            raise KeyError(f"Blob {blob} not found in the repository")
+        content = stdout.read(int(header[2]))
+        stdout.read(1)
+        return blob, content
+
+    def prefetch(self, blobs: list[str]):
+        # responses nobody read are dropped, prefetching only covers the next few reads
+        self._ready.clear()
+        for index, pending in enumerate(self._pending):
+            while len(pending) > 0:
+                self._receive(index)
+
+        requests: list[list[str]] = [[] for _ in self._processes]
+        for blob in dict.fromkeys(blobs):
+            requests[self._index(blob)].append(blob)
+        for index, blobs_of_process in enumerate(requests):
+            if len(blobs_of_process) > 0:
+                self._request(index, blobs_of_process[:self.MAX_PENDING])
+
+    def read(self, blob: str) -> bytes:
+        content = self._ready.pop(blob, None)
+        if content is not None:
+            return content
+
+        index = self._index(blob)
+        if blob not in self._pending[index]:
+            self._request(index, [blob])
+        while True:
+            received, content = self._receive(index)
+            if received == blob:
+                return content
+            self._ready[received] = content
+
+    def close(self):
+        for process in self._processes:
+            process.stdin.close()
+            process.wait()
+        self._processes = []
+
+
+def open_blob_reader(repo_path: str) -> BlobReader:
+    """Opens the reader selected by BLOB_READER
+
+    Args:
+        repo_path (str): Local repository path
+
+    Returns:
+        BlobReader: Reader of file contents
+    """
+    if BLOB_READER == "gitpython":
+        return GitBlobReader(repo_path)
+    if BLOB_READER == "cat-file":
+        return CatFileBlobPool(repo_path, BLOB_READER_PROCESSES)
+    raise ValueError(f"Unknown blob reader {BLOB_READER}")
+
+
+def run_lizard(file_name: str, source: str, timer: StageTimer) -> lizard.FileInformation:
+    """Parses source code with lizard, timing it as a file parse
+
+    Args:
+        file_name (str): File name, selects the language
+        source (str): Source code
+        timer (StageTimer): Timer of the lizard stage
+
+    Returns:
+        lizard.FileInformation: Functions and totals of the source
+    """
+    start = time.perf_counter()
+    analysis = lizard.analyze_file.analyze_source_code(file_name, source)
+    elapsed = time.perf_counter() - start
+    timer.add("lizard", elapsed)
+    timer.file_parse_seconds.append(elapsed)
+    if timer.trace is not None:
+        timer.trace.complete("lizard", "lizard", start, elapsed, dict(chars=len(source)))
+    return analysis
+
+
+class ComplexityEngine(ABC):
+    """Computes the cyclomatic complexity of a changed file
+    """
+
+    # The results don't depend on the revisions the engine analyzed before
+    EXACT: bool = True
+
+    @abstractmethod
+    def analyze(self, file: ChangedFile, source: str, reader: BlobReader,
+                timer: StageTimer) -> tuple[int, int, int | None]:
+        """Gets the complexity of the new content of a file
+
+        Args:
+            file (ChangedFile): Changed file
+            source (str): New content of the file
+            reader (BlobReader): Reader of other revisions of the file
+            timer (StageTimer): Timer of the stages
+
+        Returns:
+            tuple[int, int, int | None]: Complexity, number of methods and lines of code,
+            lines of code are None when the result doesn't come from a full lizard parse
+        """
+
+    def reset(self):
+        """Forgets the earlier revisions whose use makes the results depend on
+        which commits the engine saw before
+        """
+
+
+class LizardEngine(ComplexityEngine):
+    """Parses the whole file with lizard
+    """
+
+    def analyze(self, file: ChangedFile, source: str, reader: BlobReader,
+                timer: StageTimer) -> tuple[int, int, int | None]:
+        analysis = run_lizard(file.filename, source, timer)
+        return analysis.CCN, len(analysis.function_list), analysis.nloc
+
+
+class IncrementalLizardEngine(ComplexityEngine):
+    """Parses only the functions touched by a change
+
+    The file complexity is the sum of its functions' complexities, so the
+    functions of the previous revision that don't overlap a changed hunk keep
+    their complexity and are only moved by the lines added or removed before
+    them. The changed regions, extended to the functions they touch, are
+    parsed with lizard. Function tables are kept by blob id, so the previous
+    revision is the parent's version on every branch.
+
+    Files with #else or #elif are parsed whole, lizard only reads one side of
+    the conditional and a region boundary could fall inside it. So are changes
+    after which a region doesn't keep its outer level blocks and nesting of
+    braces, or its balance of parentheses, comments, quotes and #if blocks, as
+    they can change how the code after it is read.
+    """
+
+    # Lines around a hunk that count as touched, the line before a function
+    # often holds its return type
+    HUNK_MARGIN: int = 1
+    # Longest middle part of a change compared line by line, longer ones are one hunk
+    MAX_MATCHED_LINES: int = 2000
+    BRACES: re.Pattern = re.compile(r"[{}]")
+
+    def __init__(self, max_tables: int = 100_000):
+        # function tables by blob id, (first line, last line, complexity) per function
+        self._tables: OrderedDict[str, list[tuple[int, int, int]]] = OrderedDict()
+        self._max_tables = max_tables
+
+    def _remember(self, blob: str, table: list[tuple[int, int, int]]):
+        self._tables[blob] = table
+        self._tables.move_to_end(blob)
+        if len(self._tables) > self._max_tables:
+            self._tables.popitem(last=False)
+
+    @staticmethod
+    def _function_table(analysis: lizard.FileInformation, line_offset: int = 0) -> list[tuple[int, int, int]]:
+        return [(function.start_line + line_offset, function.end_line + line_offset, function.cyclomatic_complexity)
+                for function in analysis.function_list]
+
+    def _hunks(self, old_lines: list[str], new_lines: list[str]) -> list[tuple[int, int, int, int]]:
+        """Finds the changed line ranges, as 0-based half-open old and new ranges
+        """
+        prefix = 0
+        common = min(len(old_lines), len(new_lines))
+        while prefix < common and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < common - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+            suffix += 1
+        old_end, new_end = len(old_lines) - suffix, len(new_lines) - suffix
+        if prefix == old_end and prefix == new_end:
+            return []
+        if max(old_end, new_end) - prefix > self.MAX_MATCHED_LINES:
+            return [(prefix, old_end, prefix, new_end)]
+
+        matcher = difflib.SequenceMatcher(None, old_lines[prefix:old_end], new_lines[prefix:new_end], autojunk=False)
+        return [(prefix + old_start, prefix + old_stop, prefix + new_start, prefix + new_stop)
+                for tag, old_start, old_stop, new_start, new_stop in matcher.get_opcodes() if tag != "equal"]
+
+    @classmethod
+    def _structure(cls, text: str) -> tuple[int, ...]:
+        """Gets the balance of the characters that can change how the code after a text is read
+
+        Comments and strings are removed first, so what is left of a "/*" or a quote is one that
+        is not closed in the text and leaves the code after it inside a comment or string.
+        """
+        code = ApproximateEngine.COMMENTS_AND_STRINGS.sub(" ", text)
+        depth = lowest = closed = 0
+        for brace in cls.BRACES.findall(code):
+            if brace == "{":
+                depth += 1
+                continue
+            depth -= 1
+            lowest = min(lowest, depth)
+            # blocks closed at the outer level, a brace moved into a function ends it early
+            closed += depth <= 0
+        return (depth, lowest, closed,
+                code.count("(") - code.count(")"),
+                code.count("/*"),
+                code.count("*/"),
+                code.count('"'),
+                code.count("'"),
+                code.count("#if") - code.count("#endif"))
+
+    def analyze(self, file: ChangedFile, source: str, reader: BlobReader,
+                timer: StageTimer) -> tuple[int, int, int | None]:
+        old_table = self._tables.get(file.old_blob) if file.old_blob is not None else None
+        if old_table is None or "#el" in source:
+            return self._analyze_whole(file, source, timer)
+
+        with timer.stage("blob_read"):
+            old_source = reader.read(file.old_blob).decode("utf-8", "ignore")
+        if "#el" in old_source:
+            return self._analyze_whole(file, source, timer)
+
+        # lizard counts lines by newline characters
+        old_lines = old_source.split("\n")
+        new_lines = source.split("\n")
+        with timer.stage("diff_hunks"):
+            hunks = self._hunks(old_lines, new_lines)
+
+        # functions touched by a hunk or its margin are parsed again, with
+        # everything between the untouched functions around them, so a parsed
+        # region never starts inside a comment or a function
+        ranges = [(old_start + 1 - self.HUNK_MARGIN, old_stop + self.HUNK_MARGIN) for old_start, old_stop, _, _ in hunks]
+        untouched = [function for function in old_table
+                     if not any(function[0] <= last and function[1] >= first for first, last in ranges)]
+        untouched_ends = sorted(end_line for _, end_line, _ in untouched)
+        untouched_starts = sorted(start_line for start_line, _, _ in untouched)
+        regions: list[list[int]] = []
+        for first, last in ranges:
+            before = bisect_left(untouched_ends, first)
+            after = bisect_right(untouched_starts, last)
+            first = untouched_ends[before - 1] + 1 if before > 0 else 1
+            last = untouched_starts[after] - 1 if after < len(untouched_starts) else len(old_lines)
+            if len(regions) > 0 and first <= regions[-1][1] + 1:
+                regions[-1][1] = max(regions[-1][1], last)
+            else:
+                regions.append([first, last])
+
+        # move the untouched functions by the lines added before them
+        new_regions: list[tuple[int, int]] = []
+        for first, last in regions:
+            # region bounds are unchanged lines, or the file ends, so they map through the hunks before them
+            new_first, new_last = 1, len(new_lines)
+            if first > 1:
+                new_first = first + sum((new_stop - new_start) - (old_stop - old_start)
+                                        for old_start, old_stop, new_start, new_stop in hunks
+                                        if old_stop <= first - 1)
+            if last < len(old_lines):
+                new_last = last + sum((new_stop - new_start) - (old_stop - old_start)
+                                      for old_start, old_stop, new_start, new_stop in hunks
+                                      if old_start <= last - 1)
+            if self._structure("\n".join(old_lines[first - 1:last])) \
+                    != self._structure("\n".join(new_lines[new_first - 1:new_last])):
+                return self._analyze_whole(file, source, timer)
+            new_regions.append((new_first, new_last))
+
+        table: list[tuple[int, int, int]] = []
+        for start_line, end_line, complexity in untouched:
+            if any(first <= end_line and last >= start_line for first, last in regions):
+                # nested in a parsed region
+                continue
+            shift = sum((new_stop - new_start) - (old_stop - old_start)
+                        for old_start, old_stop, new_start, new_stop in hunks if old_stop <= start_line - 1)
+            table.append((start_line + shift, end_line + shift, complexity))
+
+        for new_first, new_last in new_regions:
+            region_source = "\n".join(new_lines[new_first - 1:new_last])
+            table += self._function_table(run_lizard(file.filename, region_source, timer), new_first - 1)
+
+        table.sort()
+        if file.blob is not None:
+            self._remember(file.blob, table)
+        return sum(complexity for _, _, complexity in table), len(table), None
+
+    def _analyze_whole(self, file: ChangedFile, source: str, timer: StageTimer) -> tuple[int, int, int | None]:
+        analysis = run_lizard(file.filename, source, timer)
+        if file.blob is not None:
+            self._remember(file.blob, self._function_table(analysis))
+        return analysis.CCN, len(analysis.function_list), analysis.nloc
+
+
+class ApproximateEngine(ComplexityEngine):
+    """Estimates the complexity of C and C++ files with regular expressions
+
+    The estimate strips comments and strings, finds the function bodies as
+    blocks opened after a closing parenthesis, and counts lizard's decision
+    points in them. Lizard runs when a file has no earlier parse, or when the
+    estimate moved by more than the tolerance since the last one. Otherwise
+    the last lizard result is moved by the change of the estimate, so errors
+    don't add up over the history. Other languages always run lizard.
+
+    The engine is reset before every COMMITS_PER_CHUNK-th commit selected by
+    the run, and worker chunks, stores and checkpoints keep the commits
+    between two resets together, so the estimates don't change with WORKERS
+    or when a run is resumed.
+    """
+
+    EXACT: bool = False
+
+    COMMENTS_AND_STRINGS: re.Pattern = re.compile(
+        r"//[^\n]*|/\*.*?\*/|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'", re.S)
+    # if, #ifdef, #elif, for, while, case and catch as whole words, the
+    # leading character class is much faster to scan for than a word boundary
+    KEYWORDS: re.Pattern = re.compile(
+        r"[iefwc](?<!\w[iefwc])(?:(?<=i)f(?:def)?|(?<=e)lif|(?<=f)or|(?<=w)hile|(?<=c)(?:ase|atch))\b")
+    BRACES: re.Pattern = re.compile(r"[{}]")
+    FUNCTION_HEAD: re.Pattern = re.compile(r"\)\s*(?:(?:const|noexcept|override|final)\s*)*$")
+    # Characters before a brace searched for a function head
+    FUNCTION_HEAD_LENGTH: int = 64
+
+    def __init__(self, tolerance: float = 0.1, max_states: int = 100_000):
+        # lizard complexity and methods, with the estimated ones at that parse, by blob id
+        self._states: OrderedDict[str, tuple[int, int, int, int]] = OrderedDict()
+        self._tolerance = tolerance
+        self._max_states = max_states
+
+    def reset(self):
+        self._states.clear()
+
+    def _remember(self, blob: str, state: tuple[int, int, int, int]):
+        self._states[blob] = state
+        self._states.move_to_end(blob)
+        if len(self._states) > self._max_states:
+            self._states.popitem(last=False)
+
+    @classmethod
+    def estimate(cls, source: str) -> tuple[int, int]:
+        """Estimates the complexity of C or C++ source code
+
+        Args:
+            source (str): Source code
+
+        Returns:
+            tuple[int, int]: Estimated complexity and number of functions
+        """
+        code = cls.COMMENTS_AND_STRINGS.sub(" ", source)
+        functions = decisions = depth = 0
+        body_depth = body_start = -1
+        for brace in cls.BRACES.finditer(code):
+            position = brace.start()
+            if brace.group() == "}":
+                depth -= 1
+                if depth == body_depth:
+                    decisions += (len(cls.KEYWORDS.findall(code, body_start, position))
+                                  + code.count("&&", body_start, position) + code.count("||", body_start, position)
+                                  + code.count("?", body_start, position))
+                    body_depth = -1
+                continue
+            if body_depth < 0 and cls.FUNCTION_HEAD.search(code, max(0, position - cls.FUNCTION_HEAD_LENGTH),
+                                                           position):
+                functions += 1
+                body_depth, body_start = depth, position
+            depth += 1
+        return functions + decisions, functions
+
+    def analyze(self, file: ChangedFile, source: str, reader: BlobReader,
+                timer: StageTimer) -> tuple[int, int, int | None]:
+        if lizard_languages.get_reader_for(file.filename) is not lizard_languages.CLikeReader:
+            analysis = run_lizard(file.filename, source, timer)
+            return analysis.CCN, len(analysis.function_list), analysis.nloc
+
+        with timer.stage("estimate"):
+            complexity, functions = self.estimate(source)
+        state = self._states.get(file.old_blob) if file.old_blob is not None else None
+        if state is not None:
+            parsed_complexity, parsed_functions, estimated_complexity, estimated_functions = state
+            if abs(complexity - estimated_complexity) <= self._tolerance * max(estimated_complexity, 1):
+                if file.blob is not None:
+                    self._remember(file.blob, state)
+                return (max(0, parsed_complexity + complexity - estimated_complexity),
+                        max(0, parsed_functions + functions - estimated_functions), None)
+
+        analysis = run_lizard(file.filename, source, timer)
+        if file.blob is not None:
+            self._remember(file.blob, (analysis.CCN, len(analysis.function_list), complexity, functions))
+        return analysis.CCN, len(analysis.function_list), analysis.nloc
+
+
+def open_complexity_engine() -> ComplexityEngine:
+    """Opens the engine selected by COMPLEXITY_ENGINE
+
+    Returns:
+        ComplexityEngine: Complexity engine
+    """
+    if COMPLEXITY_ENGINE == "lizard":
+        return LizardEngine()
+    if COMPLEXITY_ENGINE == "incremental":
+        return IncrementalLizardEngine(INCREMENTAL_TABLE_SIZE)
+    if COMPLEXITY_ENGINE == "approximate":
+        return ApproximateEngine(APPROXIMATE_TOLERANCE, APPROXIMATE_STATE_SIZE)
+    raise ValueError(f"Unknown complexity engine {COMPLEXITY_ENGINE}")
+
+
+def measure_complexity(file: ChangedFile, reader: BlobReader, cache: ComplexityCache | None,
+                       timer: StageTimer | None = None,
+                       engine: ComplexityEngine | None = None) -> tuple[int, int] | None:
+    """Gets the cyclomatic complexity and number of methods of a changed file
+
+    Same result as pydriller's file.complexity and len(file.methods), with the
+    blob read and the lizard parse timed separately.
+
+    Args:
+        file (ChangedFile): Changed file
+        reader (BlobReader): Reader of the file content
+        cache (ComplexityCache | None): Cache of lizard results, None always runs the engine
+        timer (StageTimer, optional): Timer of the blob_read, cache and lizard stages
+        engine (ComplexityEngine, optional): Engine computing the complexity, lizard by default
+
+    Returns:
+        tuple[int, int] | None: Complexity and number of methods, None if the file has no complexity
+    """
+    if timer is None:
+        timer = StageTimer()
+    if engine is None:
+        engine = LizardEngine()
+
+    language_reader = lizard_languages.get_reader_for(file.filename)
+    if language_reader is None or file.blob is None:
+        return None
+
+    language = language_reader.__name__
+    result = None
+    if cache is not None:
+        with timer.stage("cache"):
+            result = cache.get(file.blob, language)
+    if result is None:
+        with timer.stage("blob_read"):
+            content = reader.read(file.blob)
+        if not content:
+            return None
+
+        result = engine.analyze(file, content.decode("utf-8", "ignore"), reader, timer)
+        # only whole file lizard parses are cached
+        if cache is not None and result[2] is not None:
+            with timer.stage("cache"):
+                cache.put(file.blob, language, result)
+
+    return result[0], result[1]
+
+
+@dataclass
+class HistoryRange:
+    """Part of the history to analyze, empty fields don't limit anything
+
+    from_revision is excluded like in git's from..to notation, so runs over
+    consecutive ranges don't overlap and their outputs can be merged.
+    """
+    since: datetime | None = None
+    until: datetime | None = None
+    from_revision: str = ""
+    to_revision: str = ""
+
+    def is_bounded(self) -> bool:
+        """Checks if the range limits the history
+        """
+        return bool(self.since or self.until or self.from_revision or self.to_revision)
+
+    def rev_list_args(self) -> list[str]:
+        """Gets the git rev-list arguments selecting the range
+
+        Returns:
+            list[str]: Date limits and the revision range
+        """
+        args = []
+        if self.since is not None:
+            args.append(f"--since={self.since.isoformat()}")
+        if self.until is not None:
+            args.append(f"--until={self.until.isoformat()}")
+        tip = self.to_revision or "HEAD"
+        args.append(f"{self.from_revision}..{tip}" if self.from_revision else tip)
+        return args
+
+
+class RunCheckpoint(AnalysisStore):
+    """Analysis store of a single run, used to resume the run after a crash
+
+    Besides the rows of the processed commits, it keeps the last processed
+    commit and an id of the run's repository, history range and complexity
+    settings, so a resumed run doesn't mix in data from a different run. An
+    existing file that isn't a checkpoint of the same run is never replaced.
+    """
+
+    def __init__(self, file_name: str, filter_by_name: list[str], filter_by_extension: list[str],
+                 filter_by_email: list[str], filter_by_path: list[str] | None, repo_path: str,
+                 history_range: HistoryRange, resume: bool = False):
+        run = dict(repo=path.abspath(repo_path) if path.isdir(repo_path) else repo_path,
+                   since=str(history_range.since),
+                   until=str(history_range.until),
+                   from_revision=history_range.from_revision,
+                   to_revision=history_range.to_revision,
+                   **get_measurement_settings())
+        run_id = hashlib.sha1(json.dumps(run, sort_keys=True).encode()).hexdigest()
+
+        if path.exists(file_name):
+            stored_run_id = self.read_run_id(file_name)
+            if stored_run_id is None:
+                raise ValueError(f"{file_name} exists and isn't a checkpoint, move it or change CHECKPOINT_FILE_NAME")
+            if stored_run_id != run_id:
+                raise ValueError(f"Checkpoint {file_name} is from a run of a different repository, history range "
+                                 "or configuration, delete it to start over")
+            if not resume:
+                os.remove(file_name)
+        super().__init__(file_name, filter_by_name, filter_by_extension, filter_by_email, filter_by_path)
+        self.file_name: str = file_name
+        self._db.execute("CREATE TABLE IF NOT EXISTS checkpoint (key TEXT PRIMARY KEY, value TEXT)")
+        with self._db:
+            if self._get("run_id") is None:
+                self._set("run_id", run_id)
+
+    @staticmethod
+    def read_run_id(file_name: str) -> str | None:
+        """Reads the run id of an existing checkpoint file without changing it
+
+        Args:
+            file_name (str): Checkpoint file name
+
+        Returns:
+            str | None: Run id, None if the file isn't a checkpoint
+        """
+        db = sqlite3.connect(file_name)
+        try:
+            row = db.execute("SELECT value FROM checkpoint WHERE key = 'run_id'").fetchone()
+        except sqlite3.DatabaseError:
+            # not an SQLite database, or one without a checkpoint table
+            return None
+        finally:
+            db.close()
+        return None if row is None else row[0]
+
+    def _get(self, key: str) -> str | None:
+        row = self._db.execute("SELECT value FROM checkpoint WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set(self, key: str, value: str):
+        self._db.execute("INSERT OR REPLACE INTO checkpoint VALUES (?, ?)", (key, value))
+
+    def last_commit(self) -> str | None:
+        """Gets the last commit written to the checkpoint
+
+        Returns:
+            str | None: Commit hash, None if no commit was processed yet
+        """
+        return self._get("last_commit")
+
+    def add(self, hashes: list[str], data: Iterable[ParsedCommit]):
+        """Stores processed commits and moves the checkpoint past them
+
+        Args:
+            hashes (list[str]): Hashes of all processed commits, including those without data
+            data (Iterable[ParsedCommit]): Parsed data of the commits
+        """
+        super().add(hashes, data)
+        if len(hashes) > 0:
+            with self._db:
+                self._set("last_commit", hashes[-1])
+
+    def remove(self):
+        """Closes and deletes the checkpoint once the run is complete
+        """
+        self.close()
+        os.remove(self.file_name)
+
+
+def run_git(repo_path: str, *args: str) -> str:
+    """Runs a git command inside the repository and returns its output
+
+    Args:
+        repo_path (str): Local repository path
+        args (str): git command line arguments
+
+    Returns:
+        str: Standard output of the git command
+    """
+    result = subprocess.run(["git", "-C", repo_path, *args],
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def build_pathspecs(filter_by_name: list[str], filter_by_extension: list[str],
+                    filter_by_path: list[str] | None = None) -> list[str]:
+    """Translates the path, file name and extension filters into git pathspecs
+
+    Args:
+        filter_by_name (list[str]): list of file names (without extension) to filter by
+        filter_by_extension (list[str]): list of extensions to filter files by, ex. .c, .cpp, .py
+        filter_by_path (list[str], optional): list of directories or globs to limit the analysis to
+
+    Returns:
+        list[str]: List of glob pathspecs, empty if nothing is filtered
+    """
+    if len(filter_by_name) > 0 and len(filter_by_extension) > 0:
+        file_patterns = [f"{name}{ext}" for name in filter_by_name for ext in filter_by_extension]
+    elif len(filter_by_name) > 0:
+        file_patterns = [pattern for name in filter_by_name for pattern in (name, f"{name}.*")]
+    else:
+        file_patterns = [f"*{ext}" for ext in filter_by_extension]
+
+    scopes = [scope.strip("/") for scope in filter_by_path or []]
+    if len(scopes) == 0:
+        return [f":(glob)**/{pattern}" for pattern in file_patterns]
+
+    pathspecs = []
+    for scope in scopes:
+        # the scope itself can be a file, a glob can match files the patterns don't
+        # describe so git selects all of them and parse_commit filters them afterwards
+        if (len(file_patterns) == 0 or has_glob_characters(path.basename(scope))
+                or any(fnmatch.fnmatchcase(path.basename(scope), pattern) for pattern in file_patterns)):
+            pathspecs.append(f":(glob){scope}")
+        pathspecs += [f":(glob){scope}/**/{pattern}" for pattern in file_patterns or ["*"]]
+    return pathspecs
+
+
+def has_glob_characters(pattern: str) -> bool:
+    """Checks if a path filter is a glob rather than a literal path
+
+    Args:
+        pattern (str): Path filter
+
+    Returns:
+        bool: True if the filter contains *, ? or [
+    """
+    return any(character in pattern for character in "*?[")
+
+
+@lru_cache(maxsize=256)
+def compile_glob(pattern: str) -> re.Pattern:
+    """Compiles a glob with the rules of git's :(glob) pathspecs
+
+    * and ? don't match a slash, **/ matches any number of directories and a
+    trailing /** everything inside a directory.
+
+    Args:
+        pattern (str): Glob relative to the repository root
+
+    Returns:
+        re.Pattern: Regular expression matching whole paths
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            parts.append("/.*")
+            i += 3
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and (end := pattern.find("]", i + 2)) != -1:
+            chars = pattern[i + 1:end]
+            if chars[0] in "!^":
+                chars = "^" + chars[1:]
+            parts.append("[" + chars.replace("\\", "\\\\") + "]")
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(parts), re.S)
+
+
+def is_path_in_scope(file_path: str, filter_by_path: list[str] | None) -> bool:
+    """Checks if a file is below one of the path filters
+
+    A filter without glob characters is a file or a directory, a glob follows
+    the rules of git's :(glob) pathspecs. The pathspecs from build_pathspecs
+    select these files and can select a few more, which are skipped here.
+
+    Args:
+        file_path (str): File path relative to the repository root
+        filter_by_path (list[str] | None): list of directories or globs, empty doesn't filter anything
+
+    Returns:
+        bool: True if the file is in scope
+    """
+    if not filter_by_path:
+        return True
+    for scope in filter_by_path:
+        scope = scope.strip("/")
+        if not has_glob_characters(scope):
+            if file_path == scope or file_path.startswith(scope + "/"):
+                return True
+        elif compile_glob(scope).fullmatch(file_path) or compile_glob(scope + "/**").fullmatch(file_path):
+            return True
+    return False
+
+
+def find_matching_commits(repo_path: str, filter_by_name: list[str], filter_by_extension: list[str],
+                          filter_by_email: list[str], stats: RunStats,
+                          filter_by_path: list[str] | None = None,
+                          history_range: HistoryRange | None = None) -> list[str] | None:
+    """Asks git for the commits that pass the author and file filters
+
+    Commits outside of the returned list are never diffed or parsed.
+
+    Args:
+        repo_path (str): Repository path, local or remote
+        filter_by_name (list[str]): list of file names (without extension) to filter by
+        filter_by_extension (list[str]): list of extensions to filter files by, ex. .c, .cpp, .py
+        filter_by_email (list[str]): list of author emails to filter by
+        stats (RunStats): Counters updated with the number of skipped commits
+        filter_by_path (list[str], optional): list of directories or globs to limit the analysis to
+        history_range (HistoryRange, optional): Part of the history to analyze
+
+    Returns:
+        list[str] | None: Hashes of matching commits from the oldest to the newest,
+        None if the filters can't be pushed down
+    """
+    if not path.isdir(repo_path):
+        # remote repository, it is cloned by pydriller so filter afterwards
+        return None
+
+    if history_range is None:
+        history_range = HistoryRange()
+    pathspecs = build_pathspecs(filter_by_name, filter_by_extension, filter_by_path)
+    if len(pathspecs) == 0 and len(filter_by_email) == 0 and not history_range.is_bounded():
+        return None
+
+    # without --full-history git drops the side branch commits of merges that kept the other parent's files
+    args = ["rev-list", "--reverse", "--full-history", "--fixed-strings"]
+    args += [f"--author=<{email}>" for email in filter_by_email]
+    args += history_range.rev_list_args() + ["--"] + pathspecs
+    matching = run_git(repo_path, *args).split()
+
+    stats.commits_total = int(run_git(repo_path, "rev-list", "--count", *history_range.rev_list_args()))
+    stats.commits_skipped = stats.commits_total - len(matching)
+    return matching
+
+
+def iter_commit_metadata(repo_path: str, hashes: list[str], timer: StageTimer | None = None) -> Iterator[CommitMetadata]:
+    """Reads the metadata and changed files of commits from a single git log process
+
+    The output of git log is parsed as it's produced, file contents are not
+    read, and no textual diff is created. Renames are detected with
+    RENAME_SIMILARITY like pydriller does.
+
+    Args:
+        repo_path (str): Local repository path
+        hashes (list[str]): Commit hashes, the commits are returned in this order
+        timer (StageTimer, optional): Timer of the git_log stage
+
+    Yields:
+        CommitMetadata: Commit metadata
+    """
+    if timer is None:
+        timer = StageTimer()
+    if len(hashes) == 0:
+        return
+
+    # -z separates the fields and the file paths by NUL, commits start with \x01
+    renames = f"--find-renames={RENAME_SIMILARITY}%" if RENAME_SIMILARITY > 0 else "--no-renames"
+    args = ["git", "-C", repo_path, "log", "--no-walk=unsorted", "--stdin", "-z", "--raw", "--no-abbrev", renames,
+            "--root", "--date=raw", "--format=%x01%H%x00%an%x00%ae%x00%ad%x00%P%x00%B"]
+    process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    # git reads all revisions before writing anything, so this can't block on the output
+    process.stdin.write("\n".join(hashes).encode() + b"\n")
+    process.stdin.close()
+
+    def read_fields() -> Iterator[str]:
+        pending = b""
+        while chunk := process.stdout.read(1 << 16):
+            *fields, pending = (pending + chunk).split(b"\0")
+            for field in fields:
+                yield field.decode("utf-8", "replace")
+        if pending:
+            yield pending.decode("utf-8", "replace")
+
+    start = time.perf_counter()
+    fields = read_fields()
+    commit = None
+    for field in fields:
+        if field.startswith("\x01"):
+            if commit is not None:
+                timer.add("git_log", time.perf_counter() - start)
+                yield commit
+                start = time.perf_counter()
+            name, email, date, parents, msg = (next(fields) for _ in range(5))
+            timestamp, offset = date.split(" ")
+            sign = -1 if offset[0] == "-" else 1
+            commit = CommitMetadata(hash=field[1:],
+                                    timestamp=int(timestamp),
+                                    utc_offset=sign * (int(offset[1:3]) * 3600 + int(offset[3:5]) * 60),
+                                    author_name=name,
+                                    author_email=email,
+                                    parents=parents.split(),
+                                    msg=msg.strip(),
+                                    files=[])
+            continue
+
+        field = field.lstrip("\n")
+        if not field.startswith(":"):
+            # end of the commit header
+            continue
+        # :old_mode new_mode old_blob new_blob status, followed by one path or two for renames and copies
+        old_mode, new_mode, old_blob, new_blob, status = field[1:].split(" ")
+        old_path = new_path = next(fields)
+        if status[0] in "RC":
+            new_path = next(fields)
+        elif status[0] == "A":
+            old_path = None
+        elif status[0] == "D":
+            new_path = None
+        # deleted files and submodules have no content to read
+        blob = None if status[0] == "D" or new_mode == "160000" else new_blob
+        old_blob = None if status[0] == "A" or old_mode == "160000" else old_blob
+        commit.files.append(ChangedFile(old_path, new_path, blob, old_blob))
+
+    if commit is not None:
+        timer.add("git_log", time.perf_counter() - start)
+        yield commit
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, args)
+
+
+class BranchIndex:
+    """Branch membership of every commit, computed once from the branch tips
+
+    Every commit gets a bitset (python int) of the local branches containing
+    it, so the lookup doesn't need a 'git branch --contains' per commit.
+    """
+
+    def __init__(self, branch_names: list[str] | None = None, masks: dict[str, int] | None = None):
+        self._branch_names: list[str] = branch_names or []
+        self._masks: dict[str, int] = masks or {}
+        self._names_by_mask: dict[int, tuple[str, ...]] = {0: ()}
+
+    @classmethod
+    def from_repository(cls, repo_path: str) -> "BranchIndex":
+        """Builds the index with a single walk over the history of all branches
+
+        Args:
+            repo_path (str): Local repository path
+
+        Returns:
+            BranchIndex: Branch membership of all commits reachable from local branches
+        """
+        branch_names: list[str] = []
+        masks: dict[str, int] = {}
+        refs = run_git(repo_path, "for-each-ref", "--format=%(objectname) %(refname:short)", "refs/heads")
+        for bit, line in enumerate(refs.splitlines()):
+            tip, name = line.split(" ", 1)
+            branch_names.append(name)
+            masks[tip] = masks.get(tip, 0) | (1 << bit)
+
+        if len(masks) > 0:
+            # topological order lists children before parents, so a commit's
+            # mask is complete before it is pushed to its parents
+            history = run_git(repo_path, "rev-list", "--topo-order", "--parents", *masks)
+            for line in history.splitlines():
+                commit_hash, *parents = line.split()
+                mask = masks[commit_hash]
+                for parent in parents:
+                    masks[parent] = masks.get(parent, 0) | mask
+
+        return cls(branch_names, masks)
+
+    def branches(self, commit_hash: str) -> tuple[str, ...]:
+        """Gets the local branches containing a commit
+
+        Args:
+            commit_hash (str): Commit hash
+
+        Returns:
+            tuple[str, ...]: Branch names
+        """
+        mask = self._masks.get(commit_hash, 0)
+        names = self._names_by_mask.get(mask)
+        if names is None:
+            names = tuple(name for bit, name in enumerate(self._branch_names) if mask >> bit & 1)
+            self._names_by_mask[mask] = names
+        return names
+
+
+def parse_commit(commit: CommitMetadata, reader: BlobReader, filter_by_name: list[str],
+                 filter_by_extension: list[str], filter_by_email: list[str], stats: RunStats,
+                 branch_index: BranchIndex | None = None, cache: ComplexityCache | None = None,
+                 filter_by_path: list[str] | None = None,
+                 engine: ComplexityEngine | None = None) -> list[ParsedCommit]:
+    """Extracts information from a single commit
+
+    Only the files passing the filters are read from the repository.
+
+    Args:
+        commit (CommitMetadata): Commit metadata and changed files
+        reader (BlobReader): Reader of the file contents
+        filter_by_name (list[str]): list of file names (without extension) to filter by
+        filter_by_extension (list[str]): list of extensions to filter files by, ex. .c, .cpp, .py
+        filter_by_email (list[str]): list of author emails to filter by
+        stats (RunStats): Counters and timers of the run
+        branch_index (BranchIndex, optional): Branch membership of commits, None leaves the branches empty
+        cache (ComplexityCache, optional): Cache of lizard results by file content
+        filter_by_path (list[str], optional): list of directories or globs to limit the analysis to
+        engine (ComplexityEngine, optional): Engine computing the complexity, lizard by default
+
+    Returns:
+        list[ParsedCommit]: One ParsedCommit per analyzed file of the commit
+    """
+    parsed: list[ParsedCommit] = []
+    timer = stats.timer
+    commit_start = time.perf_counter()
+
+    date = commit.date
+    timestamp = commit.timestamp
+    utc_offset = commit.utc_offset
+    git_hash = commit.hash
+    user = commit.author_name
+    email = commit.author_email
+    # skip commits without proper user email
+    if (email not in filter_by_email) and (len(filter_by_email) > 0):
+        stats.commits_skipped += 1
+        return parsed
+    stats.commits_parsed += 1
+    with timer.stage("branches"):
+        branches_list = branch_index.branches(git_hash) if branch_index is not None else ()
+
+    print(f"\tcommit: {date} by {user} ({email})")
+    modified_files = commit.files
+
+    selected_files: list[ChangedFile] = []
+    for file in modified_files:
+        file_name, file_ext = path.splitext(file.filename)
+
+        # Skip files name that are not in the filter
+        if (file_name not in filter_by_name) and (len(filter_by_name) > 0):
+            stats.files_skipped += 1
+            continue
+        # Skip files extensions that are not in the filter
+        if (file_ext not in filter_by_extension) and (len(filter_by_extension) > 0):
+            stats.files_skipped += 1
+            continue
+        # Skip files outside of the filtered paths
+        if not is_path_in_scope(file.new_path or file.old_path, filter_by_path):
+            stats.files_skipped += 1
+            continue
+        selected_files.append(file)
+
+    # Only files that passed the filters are read and parsed by lizard,
+    # cached files may not be read at all so they aren't read ahead
+    if cache is None:
+        reader.prefetch([file.blob for file in selected_files if file.blob is not None])
+    for file in selected_files:
+        file_name, file_ext = path.splitext(file.filename)
+        with timer.span(file.filename, "file", path=file.new_path or file.old_path):
+            measurement = measure_complexity(file, reader, cache, timer, engine)
+        stats.files_parsed += 1
+        # Skip if file has no complexity
+        if measurement is None:
+            stats.files_without_complexity += 1
+            print(
+                f"\t - skipped: {file_name}{file_ext}")
+            print(commit.msg)
+            continue
+
+        complexity, num_of_methods = measurement
+        avg_complexity: float = 0
+
+        if num_of_methods > 0:
+            avg_complexity = complexity / num_of_methods
+        else:
+            avg_complexity = 0
+
+        parsed.append(
+            ParsedCommit(commit_hash=git_hash,
+                         commit_timestamp=timestamp,
+                         utc_offset=utc_offset,
+                         user_name=user,
+                         user_email=email,
+                         file_name=file_name,
+                         complexity=complexity,
+                         avg_complexity=avg_complexity,
+                         branches=branches_list))
+
+    if timer.trace is not None:
+        timer.trace.complete(git_hash[:10], "commit", commit_start, time.perf_counter() - commit_start,
+                             dict(hash=git_hash, date=date, email=email, files=len(modified_files),
+                                  parsed_files=len(parsed)))
+
+    return parsed
+
+
+# Repository, branch index and complexity cache opened once per worker process
+_worker_repo_path: str = ""
+_worker_reader: BlobReader | None = None
+_worker_branch_index: BranchIndex | None = None
+_worker_cache: ComplexityCache | None = None
+_worker_engine: ComplexityEngine | None = None
+_worker_trace: bool = False
+
+
+def group_by_engine_reset(matching_commits: list[str], hashes: list[str]) -> list[list[str]]:
+    """Groups commits by the COMMITS_PER_CHUNK matching commits they are among,
+    the complexity engine is reset at the first commit of every group
+
+    Args:
+        matching_commits (list[str]): Hashes of all commits selected by the run, in commit order
+        hashes (list[str]): Hashes to group, in the same order
+
+    Returns:
+        list[list[str]]: Non-empty groups of hashes
+    """
+    positions = {git_hash: position for position, git_hash in enumerate(matching_commits)}
+    groups: dict[int, list[str]] = {}
+    for git_hash in hashes:
+        groups.setdefault(positions[git_hash] // COMMITS_PER_CHUNK, []).append(git_hash)
+    return list(groups.values())
+
+
+def iter_stored_data(store: AnalysisStore, hashes: list[str], branch_index: BranchIndex) -> Iterator[ParsedCommit]:
+    """Loads stored data with the current branches of the commits
+
+    Args:
+        store (AnalysisStore): Store of analyzed commits
+        hashes (list[str]): Commit hashes in the order of the returned data
+        branch_index (BranchIndex): Branches of the repository
+
+    Yields:
+        ParsedCommit: Stored parsed data
+    """
+    for item in store.iter_data(hashes):
+        # branches created since a commit was stored may contain it now
+        item.branches = list(branch_index.branches(item.hash))
+        yield item
+
+
+def _init_worker(repo_path: str, branch_index: BranchIndex, cache_file_name: str, cache_size: int, trace: bool):
+    """Worker process initializer, opens the repository and the complexity cache
+    """
+    global _worker_repo_path, _worker_reader, _worker_branch_index, _worker_cache, _worker_engine, _worker_trace
+    _worker_repo_path = repo_path
+    _worker_reader = open_blob_reader(repo_path)
+    _worker_engine = open_complexity_engine()
+    _worker_branch_index = branch_index
+    _worker_trace = trace
+    if cache_file_name:
+        _worker_cache = ComplexityCache(cache_file_name, cache_size)
+
+
+def _parse_commit_chunk(hashes: list[str], filter_by_name: list[str], filter_by_extension: list[str],
+                        filter_by_email: list[str], filter_by_path: list[str]) -> tuple[ParsedCommitTable, RunStats]:
+    """Worker process entry point, parses a contiguous chunk of commits
+
+    Returns the parsed data as a ParsedCommitTable to keep it small when it's
+    sent back to the main process.
+    """
+    stats = RunStats()
+    if _worker_trace:
+        stats.timer.trace = TraceWriter()
+    parsed = ParsedCommitTable()
+    # an engine that isn't exact gets chunks starting at a reset,
+    # workers get them in no particular order
+    _worker_engine.reset()
+    for commit in iter_commit_metadata(_worker_repo_path, hashes, stats.timer):
+        parsed.extend(parse_commit(commit, _worker_reader, filter_by_name, filter_by_extension, filter_by_email,
+                                   stats, _worker_branch_index, _worker_cache, filter_by_path, _worker_engine))
+    if _worker_cache is not None:
+        _worker_cache.flush()
+        stats.cache_hits, stats.cache_misses = _worker_cache.hits, _worker_cache.misses
+        _worker_cache.hits = _worker_cache.misses = 0
+    return parsed, stats
+
+
+def iter_pydriller_commits(repo: Repository, filter_by_email: list[str], stats: RunStats) -> Iterator[CommitMetadata]:
+    """Reads commits through pydriller, used for remote repositories
+
+    Args:
+        repo (Repository): pydriller repository
+        filter_by_email (list[str]): list of author emails to filter by, other commits aren't diffed
+        stats (RunStats): Counters and timers
+
+    Yields:
+        CommitMetadata: Commit metadata
+    """
+    for commit in repo.traverse_commits():
+        # the commit list of a remote repository is only known while it's traversed
+        stats.commits_total += 1
+        if (commit.author.email not in filter_by_email) and (len(filter_by_email) > 0):
+            stats.commits_skipped += 1
+            continue
+        with stats.timer.stage("diff"):
+            metadata = CommitMetadata.from_pydriller(commit)
+        yield metadata
+
+
+def iter_parsed_commits(repo_path: str, filter_by_name: list[str], filter_by_extension: list[str],
+                        filter_by_email: list[str], stats: RunStats | None = None, workers: int = 1,
+                        store: AnalysisStore | None = None, cache: ComplexityCache | None = None,
+                        collect_branches: bool = True, filter_by_path: list[str] | None = None,
+                        history_range: HistoryRange | None = None) -> Iterator[ParsedCommit]:
+    """Extracts information form the commits on the repository path, yielding
+    the parsed data as the commits are processed
+
+    Args:
+        repo_path (str): Repository path, local or remote
+        filter_by_name (list[str]): list of file names (without extension) to filter by
+        filter_by_extension (list[str]): list of extensions to filter files by, ex. .c, .cpp, .py
+        filter_by_email (list[str]): list of author emails to filter by
+        stats (RunStats, optional): Counters and timers of the run
+        workers (int, optional): Number of worker processes, 1 parses in this process
+        store (AnalysisStore, optional): Store of already analyzed commits, only new commits are analyzed
+        cache (ComplexityCache, optional): Cache of lizard results by file content, workers open the same file
+        collect_branches (bool, optional): Find the branches containing each commit, False leaves them empty
+        filter_by_path (list[str], optional): list of directories or globs to limit the analysis to,
+            git only returns commits touching them
+        history_range (HistoryRange, optional): Part of the history to analyze, older commits aren't visited
+
+    Yields:
+        ParsedCommit: Parsed data in commit order, from the oldest commit
+    """
+    if stats is None:
+        stats = RunStats()
+    if history_range is None:
+        history_range = HistoryRange()
+
+    matching_commits = find_matching_commits(
+        repo_path, filter_by_name, filter_by_extension, filter_by_email, stats, filter_by_path, history_range)
+
+    branch_index = None
+    if not collect_branches:
+        branch_index = BranchIndex()
+    elif path.isdir(repo_path):
+        branch_index = BranchIndex.from_repository(repo_path)
+
+    if not path.isdir(repo_path):
+        # remote repository, the commit list is only known after pydriller clones it
+        workers = 1
+        store = None
+        if history_range.from_revision or history_range.to_revision:
+            raise ValueError("Revision ranges need a local repository, use dates for remote repositories")
+    elif matching_commits is None:
+        matching_commits = run_git(repo_path, "rev-list", "--reverse", *history_range.rev_list_args()).split()
+        stats.commits_total = len(matching_commits)
+
+    engine = open_complexity_engine()
+    commits_to_parse = matching_commits
+    analyzed: set[str] = set()
+    if store is not None:
+        analyzed = store.analyzed_hashes()
+        commits_to_parse = [git_hash for git_hash in matching_commits if git_hash not in analyzed]
+        if not engine.EXACT:
+            # the stored commits among new ones are parsed again, but not stored twice,
+            # so the engine sees the same commits since its last reset as in a single run
+            commits_to_parse = [git_hash for group in group_by_engine_reset(matching_commits, matching_commits)
+                                if not analyzed.issuperset(group) for git_hash in group]
+        stats.commits_stored = len(matching_commits) - len(commits_to_parse)
+
+    # rows of new commits are yielded as they are parsed when no stored commit comes after them
+    streamed = store is None
+    if isinstance(store, RunCheckpoint) and commits_to_parse == matching_commits[stats.commits_stored:]:
+        # a checkpoint has the first commits of the run, their rows come before the new ones
+        streamed = True
+        yield from iter_stored_data(store, matching_commits[:stats.commits_stored], branch_index)
+
+    if workers > 1:
+        if engine.EXACT:
+            # Many small chunks keep the workers busy when commit sizes differ
+            chunk_size = max(1, min(COMMITS_PER_CHUNK, len(commits_to_parse) // (workers * 4)))
+            chunks = [commits_to_parse[i:i + chunk_size] for i in range(0, len(commits_to_parse), chunk_size)]
+        else:
+            chunks = group_by_engine_reset(matching_commits, commits_to_parse)
+        # executor.map returns the chunks in the original commit order
+        cache_args = ("", 0) if cache is None else (cache.file_name, cache.max_size)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(repo_path, branch_index, *cache_args,
+                                           stats.timer.trace is not None)) as executor:
+            results = executor.map(_parse_commit_chunk, chunks, repeat(filter_by_name),
+                                   repeat(filter_by_extension), repeat(filter_by_email), repeat(filter_by_path))
+            for chunk, (parsed, chunk_stats) in zip(chunks, results):
+                stats.merge(chunk_stats)
+                if store is not None:
+                    store.add([git_hash for git_hash in chunk if git_hash not in analyzed],
+                              [item for item in parsed if item.hash not in analyzed])
+                if streamed:
+                    yield from parsed
+
+    elif commits_to_parse is None or len(commits_to_parse) > 0:
+        reader = None
+        reset_hashes: set[str] = set()
+        if commits_to_parse is None:
+            repo = Repository(repo_path, since=history_range.since, to=history_range.until)
+            list_of_commits = iter_pydriller_commits(repo, filter_by_email, stats)
+        else:
+            # git already selected the commits, one git log reads all of them
+            reader = open_blob_reader(repo_path)
+            list_of_commits = iter_commit_metadata(repo_path, commits_to_parse, stats.timer)
+            reset_hashes = {group[0] for group in group_by_engine_reset(matching_commits, commits_to_parse)}
+
+        pending_hashes: list[str] = []
+        pending_data: list[ParsedCommit] = []
+        try:
+            for position, commit in enumerate(list_of_commits):
+                if reader is None:
+                    # remote repository, read the clone made by pydriller
+                    reader = open_blob_reader(str(repo.git.path))
+                    if branch_index is None:
+                        branch_index = BranchIndex.from_repository(str(repo.git.path))
+                if commit.hash in reset_hashes or (commits_to_parse is None and position % COMMITS_PER_CHUNK == 0):
+                    # the store is written between resets, so a resumed run resets at the same commits
+                    if store is not None and len(pending_hashes) > 0:
+                        store.add(pending_hashes, pending_data)
+                        pending_hashes, pending_data = [], []
+                    engine.reset()
+                parsed = parse_commit(commit, reader, filter_by_name, filter_by_extension, filter_by_email, stats,
+                                      branch_index, cache, filter_by_path, engine)
+                if store is not None and commit.hash not in analyzed:
+                    pending_hashes.append(commit.hash)
+                    pending_data.extend(parsed)
+                if streamed:
+                    yield from parsed
+
+            if store is not None:
+                store.add(pending_hashes, pending_data)
+        finally:
+            # also when parsing fails or the caller stops iterating, so no git process is left running
+            if reader is not None:
+                reader.close()
+
+        if cache is not None:
+            cache.flush()
+            stats.cache_hits, stats.cache_misses = cache.hits, cache.misses
+
+    if not streamed:
+        # new commits are in the store now, all data is streamed from it
+        yield from iter_stored_data(store, matching_commits, branch_index)
+
+
+def parse_commits(repo_path: str, filter_by_name: list[str], filter_by_extension: list[str], filter_by_email: list[str],
+                  stats: RunStats | None = None, workers: int = 1,
+                  store: AnalysisStore | None = None, cache: ComplexityCache | None = None,
+                  collect_branches: bool = True, filter_by_path: list[str] | None = None,
+                  history_range: HistoryRange | None = None) -> list[ParsedCommit]:
+    """Extracts information form the commits on the repository path
+
+    Same arguments as iter_parsed_commits.
+
+    Returns:
+        list[ParsedCommit]: List of LinearHistory objects containing parsed data
+    """
+    return list(iter_parsed_commits(repo_path, filter_by_name, filter_by_extension, filter_by_email, stats,
+                                    workers, store, cache, collect_branches, filter_by_path, history_range))
+
+
+class DataAggregator:
+    """Builds the file list, the email list and the groupings in a single
+    pass over the parsed data, each item is looked at once
+    """
+
+    def __init__(self, by_file: bool = True, by_date: bool = True):
+        self._files: set[str] = set()
+        self._emails: set[str] = set()
+        self._by_file: dict[str, dict] | None = {} if by_file else None
+        self._by_date: dict[str, dict] | None = {} if by_date else None
+
+    def add(self, item: ParsedCommit):
+        """Adds an item of parsed data
+
+        Args:
+            item (ParsedCommit): Parsed data
+        """
+        self._files.add(item.file_name)
+        self._emails.add(item.email)
+        avg_ccn = f"{item.avg_ccn:.3f}"
+
+        if self._by_file is not None:
+            record = self._by_file.get(item.file_name)
+            if record is None:
+                record = self._by_file[item.file_name] = dict(filename=item.file_name)
+            record[str(item.timestamp)] = avg_ccn
+
+        if self._by_date is not None:
+            record = self._by_date.get(item.hash)
+            if record is None:
+                record = self._by_date[item.hash] = dict(
+                    hash=item.hash,
+                    timestamp=item.timestamp,
+                    utc_offset=item.utc_offset,
+                    user=item.user,
+                    user_email=item.email,
+                    branches=item.branches
+                )
+            record[item.file_name] = avg_ccn
+
+    def extend(self, data: Iterable[ParsedCommit]) -> "DataAggregator":
+        """Adds parsed data, consumed one item at a time
+
+        Args:
+            data (Iterable[ParsedCommit]): Parsed data, can be a generator
+
+        Returns:
+            DataAggregator: self
+        """
+        for item in data:
+            self.add(item)
+        return self
+
+    def file_list(self) -> list[str]:
+        """Gets a sorted list of file names
+        """
+        return sorted(self._files)
+
+    def email_list(self) -> list[str]:
+        """Gets a sorted list of user emails
+        """
+        return sorted(self._emails)
+
+    def group_by_file(self) -> list:
+        """Gets records grouped by file name, sorted by file name
+        """
+        return [self._by_file[file_name] for file_name in sorted(self._by_file)]
+
+    def group_by_date(self) -> list:
+        """Gets records grouped by commit, sorted by date
+        """
+        return sorted(self._by_date.values(), key=lambda x: x["timestamp"])
+
+
+def merge_grouped_data(*grouped_data: list) -> list:
+    """Merges grouped data of runs over different history ranges
+
+    Records grouped by file are merged by file name, records grouped by date
+    are merged by commit hash (the later run wins) and sorted by date.
+
+    Args:
+        grouped_data (list): Outputs of group_data_by_file or of group_data_by_date
+
+    Returns:
+        list: Merged grouped data
+    """
+    merged: dict[str, dict] = {}
+    for data in grouped_data:
+        for record in data:
+            key = record["filename"] if "filename" in record else record["hash"]
+            if key in merged and "filename" in record:
+                merged[key].update(record)
+            else:
+                merged[key] = dict(record)
+
+    if any("filename" in record for record in merged.values()):
+        return [merged[file_name] for file_name in sorted(merged)]
+    return sorted(merged.values(), key=lambda x: x["timestamp"])
+
+
+def get_list_of_files(data: Iterable[ParsedCommit]) -> list[str]:
+    """Gets a list of files from parsed commit data
+
+    Args:
+        data (Iterable[ParsedCommit]): List of ParsedCommit objects containing parsed data
+
+    Returns:
+        list[str]: List of file names
+    """
+    return DataAggregator(by_file=False, by_date=False).extend(data).file_list()
+
+
+def get_list_of_user_emails(data: Iterable[ParsedCommit]) -> list[str]:
+    """Gets a list of users from the parsed commit data
+
+    Args:
+        data (Iterable[ParsedCommit]): List of ParsedCommit objects containing parsed data
+
+    Returns:
+        list[str]: List of user emails
+    """
+    return DataAggregator(by_file=False, by_date=False).extend(data).email_list()
+
+
+def write_data_to_json(output_file_name: str, data, compact: bool = False):
+    """Writes data to a JSON file
+
+    Items of a list, tuple or iterator (ex. a generator) are encoded and
+    written one at a time, so only the largest item is ever held in memory as
+    a string. Other values are written by json.dump.
+
+    Args:
+        output_file_name (str): File name
+        data (Any): List, tuple or iterator of items, or any other JSON value
+        compact (bool, optional): Write without indentation and whitespace
+    """
+    indent = None if compact else 2
+    separators = (",", ":") if compact else None
+    with open(output_file_name+'.json', "w", encoding="utf-8") as f:
+        if not isinstance(data, (list, tuple, Iterator)):
+            json.dump(data, f, indent=indent, separators=separators)
+            return
+
+        # same layout as json.dumps of the whole list
+        empty = True
+        f.write("[")
+        for item in data:
+            if not empty:
+                f.write(",")
+            item_json = json.dumps(item, indent=indent, separators=separators)
+            if not compact:
+                item_json = "\n  " + item_json.replace("\n", "\n  ")
+            f.write(item_json)
+            empty = False
+        if not compact and not empty:
+            f.write("\n")
+        f.write("]")
+
+
+def write_complexity_matrix(output_file_name: str, data: ParsedCommitTable):
+    """Writes a dense files x commits matrix of average complexity to a NumPy .npz file
+
+    Columns follow the commit order of the data. A file keeps its last known
+    average complexity in the commits that don't modify it, it's NaN before
+    the file is first seen. The archive holds the arrays "files", "commits",
+    "timestamps" (UTC epoch seconds), "utc_offsets" and "avg_ccn".
+
+    Args:
+        output_file_name (str): File name
+        data (ParsedCommitTable): Parsed data
+    """
+    if np is None:
+        raise ImportError("numpy is required to write the complexity matrix")
+
+    num_files = len(data.files.values)
+    num_commits = len(data.commit_hash)
+    file_index = np.asarray(data.file, dtype=np.intp)
+    commit_index = np.asarray(data.commit_index, dtype=np.intp)
+
+    matrix = np.full((num_files, num_commits), np.nan)
+    matrix[file_index, commit_index] = np.asarray(data.avg_ccn, dtype=np.float64)
+
+    # carry forward: every cell takes the value of the last column with a measurement
+    last_measured = np.where(np.isnan(matrix), 0, np.arange(num_commits))
+    np.maximum.accumulate(last_measured, axis=1, out=last_measured)
+    matrix = matrix[np.arange(num_files)[:, None], last_measured]
+
+    np.savez_compressed(output_file_name + '.npz',
+                        files=np.array(data.files.values, dtype=str),
+                        commits=np.array(data.commit_hash, dtype=str),
+                        timestamps=np.asarray(data.commit_timestamp, dtype=np.int64),
+                        utc_offsets=np.asarray(data.commit_utc_offset, dtype=np.int32),
+                        avg_ccn=matrix)
+
+
+class ParquetDataWriter:
+    """Writes parsed data into a Parquet file with typed columns
+
+    Timestamps are int64 UTC epoch seconds, file, user and email columns are
+    dictionary encoded, ccn and avg_ccn are numbers. Rows are buffered and
+    written one row group at a time as the data streams in.
+    """
+
+    SCHEMA = None if pa is None else pa.schema([
+        ("hash", pa.string()),
+        ("timestamp", pa.int64()),
+        ("utc_offset", pa.int32()),
+        ("user", pa.dictionary(pa.int32(), pa.string())),
+        ("email", pa.dictionary(pa.int32(), pa.string())),
+        ("branches", pa.list_(pa.string())),
+        ("file_name", pa.dictionary(pa.int32(), pa.string())),
+        ("ccn", pa.int64()),
+        ("avg_ccn", pa.float64()),
+    ])
+
+    def __init__(self, output_file_name: str, row_group_size: int):
+        if pa is None:
+            raise ImportError("pyarrow is required to write Parquet output")
+
+        self.row_group_size: int = row_group_size
+        self._writer = pq.ParquetWriter(output_file_name + '.parquet', self.SCHEMA)
+        self._columns: dict[str, list] = {field.name: [] for field in self.SCHEMA}
+
+    def add(self, item: ParsedCommit):
+        """Adds a row, a row group is written when enough rows are buffered
+
+        Args:
+            item (ParsedCommit): Parsed data
+        """
+        self._columns["hash"].append(item.hash)
+        self._columns["timestamp"].append(item.timestamp)
+        self._columns["utc_offset"].append(item.utc_offset)
+        self._columns["user"].append(item.user)
+        self._columns["email"].append(item.email)
+        self._columns["branches"].append(item.branches)
+        self._columns["file_name"].append(item.file_name)
+        self._columns["ccn"].append(item.ccn)
+        self._columns["avg_ccn"].append(item.avg_ccn)
+
+        if len(self._columns["hash"]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows as a row group
+        """
+        if len(self._columns["hash"]) == 0:
+            return
+        self._writer.write_table(pa.Table.from_pydict(self._columns, schema=self.SCHEMA))
+        for column in self._columns.values():
+            column.clear()
+
+    def close(self):
+        """Writes the remaining rows and closes the file
+        """
+        self.flush()
+        self._writer.close()
+
+
+class SQLiteDataWriter:
+    """Writes parsed data into normalized SQLite tables
+
+    Commits, files and authors get their own tables, measurements refer to
+    them by ID. Measurements are indexed by (file_id, timestamp) and
+    (author_id, timestamp) for range queries. Rows are inserted in bulk
+    transactions as the data streams in.
+    """
+
+    def __init__(self, output_file_name: str, batch_size: int):
+        self.batch_size: int = batch_size
+        self._file_ids: dict[str, int] = {}
+        self._author_ids: dict[str, int] = {}
+        self._commit_ids: dict[str, int] = {}
+        self._pending: dict[str, list[tuple]] = dict(commits=[], files=[], authors=[], measurements=[])
+
+        self._db = sqlite3.connect(output_file_name + '.sqlite')
+        self._db.executescript("""
+            DROP TABLE IF EXISTS measurements;
+            DROP TABLE IF EXISTS commits;
+            DROP TABLE IF EXISTS files;
+            DROP TABLE IF EXISTS authors;
+            CREATE TABLE authors (
+                id INTEGER PRIMARY KEY,
+                email TEXT NOT NULL UNIQUE,
+                name TEXT);
+            CREATE TABLE files (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE);
+            CREATE TABLE commits (
+                id INTEGER PRIMARY KEY,
+                hash TEXT NOT NULL UNIQUE,
+                timestamp INTEGER NOT NULL,
+                utc_offset INTEGER,
+                author_id INTEGER REFERENCES authors (id),
+                branches TEXT);
+            CREATE TABLE measurements (
+                commit_id INTEGER REFERENCES commits (id),
+                file_id INTEGER REFERENCES files (id),
+                author_id INTEGER REFERENCES authors (id),
+                timestamp INTEGER NOT NULL,
+                ccn INTEGER,
+                avg_ccn REAL);
+        """)
+
+    def _get_id(self, ids: dict[str, int], table: str, key: str, *values) -> int:
+        row_id = ids.get(key)
+        if row_id is None:
+            row_id = ids[key] = len(ids) + 1
+            self._pending[table].append((row_id, key, *values))
+        return row_id
+
+    def add(self, item: ParsedCommit):
+        """Adds a row, rows are inserted when a batch is full
+
+        Args:
+            item (ParsedCommit): Parsed data
+        """
+        author_id = self._get_id(self._author_ids, "authors", item.email, item.user)
+        file_id = self._get_id(self._file_ids, "files", item.file_name)
+        commit_id = self._get_id(self._commit_ids, "commits", item.hash,
+                                 item.timestamp, item.utc_offset, author_id, json.dumps(item.branches))
+        self._pending["measurements"].append((commit_id, file_id, author_id, item.timestamp, item.ccn, item.avg_ccn))
+
+        if len(self._pending["measurements"]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Inserts pending rows in a single transaction
+        """
+        with self._db:
+            self._db.executemany("INSERT INTO authors VALUES (?, ?, ?)", self._pending["authors"])
+            self._db.executemany("INSERT INTO files VALUES (?, ?)", self._pending["files"])
+            self._db.executemany("INSERT INTO commits VALUES (?, ?, ?, ?, ?, ?)", self._pending["commits"])
+            self._db.executemany("INSERT INTO measurements VALUES (?, ?, ?, ?, ?, ?)", self._pending["measurements"])
+        for rows in self._pending.values():
+            rows.clear()
+
+    def close(self):
+        """Inserts the remaining rows, creates the indexes and closes the database
+        """
+        self.flush()
+        # indexes are built once at the end, cheaper than updating them on every insert
+        with self._db:
+            self._db.executescript("""
+                CREATE INDEX measurements_file_time ON measurements (file_id, timestamp);
+                CREATE INDEX measurements_author_time ON measurements (author_id, timestamp);
+                CREATE INDEX commits_time ON commits (timestamp);
+            """)
+        self._db.close()
+
+
+def group_data_by_date(input_data: Iterable[ParsedCommit]) -> list:
+    """Group data by date
+
+    The input is consumed one item at a time, it can be a generator.
+    """
+    return DataAggregator(by_file=False).extend(input_data).group_by_date()
+
+
+def group_data_by_file(input_data: Iterable[ParsedCommit]) -> list:
+    """Group data by file name
+
+    The input is consumed one item at a time, it can be a generator.
+    """
+    return DataAggregator(by_date=False).extend(input_data).group_by_file()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resume", action="store_true",
+                        help=f"continue an interrupted run from its checkpoint ({CHECKPOINT_FILE_NAME})")
+    args = parser.parse_args()
+
+    print("::: [ Git Repository Analyzer ] :::")
+    print(" * Parsing commits ...")
+    run_start = time.perf_counter()
+    run_stats = RunStats()
+    if TRACE_FILE_NAME:
+        run_stats.timer.trace = TraceWriter(TRACE_FILE_NAME)
+    history_range = HistoryRange(since=datetime.fromisoformat(SINCE_DATE) if SINCE_DATE else None,
+                                 until=datetime.fromisoformat(UNTIL_DATE) if UNTIL_DATE else None,
+                                 from_revision=FROM_REVISION,
+                                 to_revision=TO_REVISION)
+    analysis_store = None
+    checkpoint = None
+    if STORE_FILE_NAME:
+        analysis_store = AnalysisStore(STORE_FILE_NAME, FILTER_FILE_NAMES, FILTER_FILE_TYPES, FILTER_USER_EMAIL,
+                                       FILTER_PATHS)
+    elif CHECKPOINT_FILE_NAME and path.isdir(REPO_PATH):
+        # the rows of processed commits go to the checkpoint, a resumed run reads them back from it
+        if args.resume and not path.exists(CHECKPOINT_FILE_NAME):
+            print(f" * No checkpoint {CHECKPOINT_FILE_NAME} to resume from, starting over")
+        checkpoint = RunCheckpoint(CHECKPOINT_FILE_NAME, FILTER_FILE_NAMES, FILTER_FILE_TYPES, FILTER_USER_EMAIL,
+                                   FILTER_PATHS, REPO_PATH, history_range, args.resume)
+        if checkpoint.last_commit() is not None:
+            print(f" * Resuming after commit {checkpoint.last_commit()}")
+        analysis_store = checkpoint
+    complexity_cache = None
+    if COMPLEXITY_CACHE_FILE_NAME:
+        complexity_cache = ComplexityCache(COMPLEXITY_CACHE_FILE_NAME, COMPLEXITY_CACHE_SIZE)
+    parsed_commits = iter_parsed_commits(
+        REPO_PATH, FILTER_FILE_NAMES, FILTER_FILE_TYPES, FILTER_USER_EMAIL, run_stats, WORKERS, analysis_store,
+        complexity_cache, COLLECT_BRANCHES, FILTER_PATHS, history_range)
+
+    # Parsed commits are aggregated as they are yielded, never kept in a list
+    aggregator = DataAggregator(by_file=OUTPUT_GROUP_BY == "file", by_date=OUTPUT_GROUP_BY == "date")
+    parsed_table = ParsedCommitTable() if OUTPUT_MATRIX else None
+    data_writers = []
+    if OUTPUT_PARQUET:
+        data_writers.append(ParquetDataWriter(OUTPUT_FILE_NAME, PARQUET_ROW_GROUP_SIZE))
+    if OUTPUT_SQLITE:
+        data_writers.append(SQLiteDataWriter(OUTPUT_FILE_NAME, SQLITE_BATCH_SIZE))
+    run_timer = run_stats.timer
+    for parsed_commit in parsed_commits:
+        with run_timer.stage("grouping"):
+            aggregator.add(parsed_commit)
+            if parsed_table is not None:
+                parsed_table.append(parsed_commit)
+        with run_timer.stage("data_writers"):
+            for data_writer in data_writers:
+                data_writer.add(parsed_commit)
+    with run_timer.stage("data_writers"):
+        for data_writer in data_writers:
+            data_writer.close()
+
+    if analysis_store is not None and checkpoint is None:
+        analysis_store.close()
+    if complexity_cache is not None:
+        complexity_cache.close()
+    print(f" * Commit parsing done ({run_stats})")
+
+    with run_timer.stage("grouping"), run_timer.span("grouping", "output"):
+        file_list = aggregator.file_list()
+        email_list = aggregator.email_list()
+        if OUTPUT_GROUP_BY == "date":
+            grouped_data = aggregator.group_by_date()
+        else:
+            grouped_data = aggregator.group_by_file()
+
+    print(" * Write a JSON files")
+    with run_timer.stage("json"):
+        for name, data in ((OUTPUT_FILE_NAME, grouped_data),
+                           (OUTPUT_FILE_NAME+'_file_list', file_list),
+                           (OUTPUT_FILE_NAME+'_email_list', email_list)):
+            with run_timer.span("write_data_to_json", "output", file=name):
+                write_data_to_json(name, data, OUTPUT_COMPACT)
+    if parsed_table is not None:
+        print(" * Write the complexity matrix")
+        with run_timer.stage("matrix"):
+            write_complexity_matrix(OUTPUT_FILE_NAME+'_matrix', parsed_table)
+
+    if RUN_SUMMARY_FILE_NAME:
+        run_summary = run_stats.summary()
+        run_summary["total_seconds"] = round(time.perf_counter() - run_start, 6)
+        write_data_to_json(RUN_SUMMARY_FILE_NAME, run_summary)
+
+    if run_timer.trace is not None:
+        run_timer.trace.close()
+    if checkpoint is not None:
+        # all outputs are written, nothing is left to resume
+        checkpoint.remove()
+
+    print(" * Done")
+    exit(0)